@@ -0,0 +1,161 @@
+"""HTTP scoring service for the loan-origination system.
+
+Run with:  uvicorn api:app --host 0.0.0.0 --port 8000
+
+Concurrent requests are merged by a MicroBatcher: the first request in a window
+waits at most RISK_MAX_WAIT_MS for company, and up to RISK_MAX_BATCH_SIZE
+applicants are scored with a single predict_proba call. Everything else is
+risk_engine.get_total_risk_async: with RISK_EARLY_EXIT=1 Gemini is skipped
+when the math score alone decides, and responses carry Timings (math_ms
+includes the wait for the batch).
+"""
+import asyncio
+import contextlib
+import os
+from typing import List
+
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+import metrics
+import risk_engine
+
+MAX_BATCH_SIZE = int(os.getenv("RISK_MAX_BATCH_SIZE", "64"))
+MAX_WAIT_MS = float(os.getenv("RISK_MAX_WAIT_MS", "5"))
+
+
+class Applicant(BaseModel):
+    age: int = Field(..., ge=18, le=100)
+    income: float = Field(..., ge=0, description="Monthly income in USD")
+    loan_amount: float = Field(..., ge=0)
+    loan_term: int = Field(..., ge=1, description="Months")
+    dti: float = Field(..., ge=0, le=1, description="Debt-to-Income Ratio")
+    credit_history: int = Field(..., ge=0, description="Years of credit history")
+    dependents: int = Field(0, ge=0)
+    user_story: str = ""
+
+    def features(self):
+        # Same order as risk_engine.FEATURE_COLUMNS
+        return [self.age, self.income, self.loan_amount, self.loan_term, self.dti, self.credit_history, self.dependents]
+
+
+class MicroBatcher:
+    """Merges math-score requests that arrive close together into one predict_proba call."""
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self._queue = None
+        self._worker = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+
+    async def score(self, features):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued, then wait out the rest of the window
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            frame = pd.DataFrame([features for features, _ in batch], columns=risk_engine.FEATURE_COLUMNS)
+            try:
+                # predict_proba releases the event loop while the forest runs
+                scores = await loop.run_in_executor(None, risk_engine._math_risk_scores, frame)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), score in zip(batch, scores):
+                if not future.done():
+                    future.set_result(float(score))
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+batcher = MicroBatcher()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Load the forest and Gemini client before the first request, not during it
+    await asyncio.to_thread(risk_engine.warmup)
+    await batcher.start()
+    yield
+    await batcher.stop()
+
+
+app = FastAPI(title="DeepCheck Credit Risk API", lifespan=lifespan)
+
+
+async def _score(applicant, priority=risk_engine.INTERACTIVE):
+    # The engine's own path (early exit, Timings); only the forest goes through the shared batch
+    try:
+        return await risk_engine.get_total_risk_async(*applicant.features(), applicant.user_story, priority=priority,
+                                                      math_scorer=batcher.score, mode="api")
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/score")
+async def score(applicant: Applicant):
+    return await _score(applicant)
+
+
+@app.post("/score/batch")
+async def score_batch(applicants: List[Applicant]):
+    # Batch callers share the Gemini quota at bulk priority, behind single /score requests
+    return await asyncio.gather(*(_score(a, risk_engine.BULK) for a in applicants))
+
+
+@app.get("/health")
+async def health():
+    return {"model_loaded": risk_engine.get_math_model() is not None, "batcher": batcher.stats(),
+            "llm_scheduler": risk_engine.llm_scheduler_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    # Empty series unless the service runs with RISK_METRICS=1
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,114 @@
+"""Latency/throughput of the FastAPI service with and without micro-batching.
+
+Run from the repo root:  python -m benchmarks.bench_api [--concurrency 32] [--duration 10]
+
+Starts `uvicorn api:app` once per configuration (offline, keyword fallback for
+the text stage) and hammers POST /score from a pool of keep-alive clients.
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pandas as pd
+
+STORY = "I need this loan to expand my small bakery business."
+
+
+def _payloads(n):
+    df = pd.read_csv("cleaned_data.csv").head(n)
+    return [json.dumps({
+        "age": int(r.age), "income": float(r.monthly_income), "loan_amount": float(r.loan_amount),
+        "loan_term": int(r.loan_term), "dti": float(r.dti), "credit_history": int(r.credit_history),
+        "dependents": int(r.num_dependents), "user_story": STORY,
+    }) for r in df.itertuples(index=False)]
+
+
+def _wait_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+def _client(port, payloads, stop_at, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    i = 0
+    while time.perf_counter() < stop_at:
+        body = payloads[i % len(payloads)]
+        i += 1
+        start = time.perf_counter()
+        conn.request("POST", "/score", body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            errors.append(response.status)
+        latencies.append(time.perf_counter() - start)
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run(max_batch_size, max_wait_ms, concurrency, duration, port):
+    env = dict(os.environ, GEMINI_API_KEY="", PYTHONWARNINGS="ignore",
+               RISK_MAX_BATCH_SIZE=str(max_batch_size), RISK_MAX_WAIT_MS=str(max_wait_ms))
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+                              env=env, stdout=subprocess.DEVNULL)
+    try:
+        _wait_ready(port)
+        payloads = _payloads(500)
+        latencies, errors = [], []
+        stop_at = time.perf_counter() + duration
+        threads = [threading.Thread(target=_client, args=(port, payloads, stop_at, latencies, errors))
+                   for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", "/health")
+        stats = json.loads(conn.getresponse().read())["batcher"]
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    return {
+        "max_batch_size": max_batch_size, "max_wait_ms": max_wait_ms, "requests": len(latencies),
+        "errors": len(errors), "rps": len(latencies) / duration,
+        "p50_ms": _percentile(latencies, 0.50) * 1000, "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "mean_batch": stats["mean_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    configs = [(1, 0.0), (args.max_batch_size, args.max_wait_ms)]
+    print(f"{'batch':>6} {'wait_ms':>8} {'requests':>9} {'err':>4} {'req/s':>9} {'p50_ms':>8} {'p99_ms':>8} {'avg_batch':>9}")
+    for max_batch_size, max_wait_ms in configs:
+        r = run(max_batch_size, max_wait_ms, args.concurrency, args.duration, args.port)
+        print(f"{r['max_batch_size']:>6} {r['max_wait_ms']:>8.1f} {r['requests']:>9} {r['errors']:>4} "
+              f"{r['rps']:>9.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['mean_batch']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Worker start-up cost: unpickling baseline_model_rf.pkl vs memory-mapping the flat artifact.
+
+Run from the repo root:  python -m benchmarks.bench_artifact [--runs 5]
+
+Each run is a fresh interpreter that loads the forest the way a worker would
+and scores one row. Reports load time and peak RSS. Mapped pages live in the
+shared page cache, so N workers cost one copy of the arrays, not N.
+Export the artifact first with `python -m tree_eval export`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+_WORKER = """
+import resource, time
+start = time.perf_counter()
+import risk_engine
+risk_engine._math_risk_score_row([30, 5000, 10000, 36, 0.3, 5, 0])
+print((time.perf_counter() - start) * 1000, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+
+def run(backend, runs):
+    env = dict(os.environ, GEMINI_API_KEY="", PYTHONWARNINGS="ignore", RISK_INFERENCE_BACKEND=backend)
+    times, rss = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _WORKER], env=env,
+                             capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[-2]))
+        rss.append(float(out[-1]))
+    return statistics.median(times), statistics.median(rss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    import risk_engine
+    if not os.path.isdir(risk_engine.RF_ARTIFACT_PATH):
+        sys.exit(f"{risk_engine.RF_ARTIFACT_PATH} not found; run `python -m tree_eval export` first")
+
+    print(f"Import + load + first score, median of {args.runs} fresh interpreters:")
+    for label, backend in (("joblib pickle (sklearn)", "sklearn"), ("mmap artifact (flat)", "flat")):
+        ms, rss_mb = run(backend, args.runs)
+        print(f"  {label:24s}: {ms:8.1f} ms   peak RSS {rss_mb:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Cold vs warm story analysis through the two-tier story cache.
+
+Run from the repo root:  python -m benchmarks.bench_cache [--stories 50] [--latency 0.5]
+
+Uses the local Gemini stub and a throwaway SQLite file, so nothing leaves the box.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import gemini_stub
+import risk_engine
+from story_cache import StoryCache
+
+
+def _time_all(stories):
+    start = time.perf_counter()
+    for story in stories:
+        risk_engine._text_risk(story)
+    return (time.perf_counter() - start) / len(stories)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stories", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub latency per call (s)")
+    args = parser.parse_args()
+
+    stories = [f"Applicant {i} needs funds to renovate the family home before winter." for i in range(args.stories)]
+    risk_engine.model = gemini_stub.StubGenerativeModel(latency_s=args.latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "story_cache.sqlite")
+        risk_engine._story_cache = StoryCache(path)
+        cold = _time_all(stories)
+        memory = _time_all(stories)
+        # A fresh process sees only the SQLite tier
+        risk_engine._story_cache = StoryCache(path)
+        disk = _time_all(stories)
+        stats = risk_engine._story_cache.stats()
+
+    print(f"cold (stub LLM) : {cold * 1e6:12,.1f} us/story")
+    print(f"warm, disk tier : {disk * 1e6:12,.1f} us/story")
+    print(f"warm, memory    : {memory * 1e6:12,.1f} us/story")
+    print(f"stats after disk pass: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Bulk report export: streamed ZIP over a process pool vs rendering everything in memory.
+
+Run from the repo root:  python -m benchmarks.bench_export [--records 300] [--workers 1,4]
+
+Scores --records applicants from cleaned_data.csv offline, then exports a PDF
+and a PNG for each. Each --workers count is timed with bulk_export.export_reports
+into a temporary ZIP. The "in memory" row is the old one-at-a-time path: one
+process renders every report and keeps the bytes in a list before zipping.
+Peak RSS of this process is printed after each run. The in-memory run goes
+last because peak RSS only grows.
+"""
+import argparse
+import io
+import logging
+import os
+import resource
+import tempfile
+import time
+import zipfile
+
+import bulk_export
+import reports
+import risk_engine
+from benchmarks.suite import _applicants
+
+
+def make_records(n):
+    risk_engine.model = None
+    risk_engine.STORY_CACHE_ENABLED = False
+    records = []
+    for i, (age, income, loan, term, dti, history, dependents, story) in enumerate(_applicants(n), 1):
+        result = risk_engine.get_total_risk(age, income, loan, term, dti, history, dependents, story)
+        result.pop("Timings", None)
+        result["Math_Contributions"] = risk_engine.explain_math_score_row([age, income, loan, term, dti, history,
+                                                                          dependents])
+        records.append({"inputs": {"income": int(income), "loan_amount": int(loan), "dti": dti, "age": int(age),
+                                   "dependents": int(dependents), "loan_term": int(term),
+                                   "credit_history": int(history), "user_story": story},
+                        "full_result": result, "custom_name": f"Case #{i}",
+                        "financial_commentary": reports.generate_financial_insight(result["Math_Score"],
+                                                                                   result["Math_Contributions"])})
+    return records
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=300)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    records = make_records(args.records)
+    print(f"{args.records:,} records, PDF + PNG each ({os.cpu_count()} CPUs)")
+    print(f"{'mode':16s} {'records/s':>10s} {'MB/s':>8s} {'ZIP MB':>8s} {'peak RSS':>10s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            stats = bulk_export.export_reports(iter(records), os.path.join(tmp, f"reports_{workers}.zip"),
+                                               workers=workers, show_progress=False)
+            print(f"{f'{workers} worker(s)':16s} {stats['records_per_s']:10.1f} {stats['mb_per_s']:8.2f} "
+                  f"{stats['zip_bytes'] / 1e6:8.1f} {peak_rss_mb():7.0f} MB")
+
+        start = time.perf_counter()
+        rendered = []
+        for record in records:
+            rendered.append(reports.create_pdf_report(record["inputs"], record["full_result"], record["custom_name"],
+                                                      record["financial_commentary"]))
+            rendered.append(reports.create_summary_image(record["inputs"], record["full_result"],
+                                                         record["custom_name"]))
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as archive:
+            for i, data in enumerate(rendered):
+                archive.writestr(f"{i:06d}", data)
+        elapsed = time.perf_counter() - start
+        total = sum(len(data) for data in rendered)
+        print(f"{'in memory':16s} {len(records) / elapsed:10.1f} {total / elapsed / 1e6:8.2f} "
+              f"{len(buf.getvalue()) / 1e6:8.1f} {peak_rss_mb():7.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Assessment history: SQLite store vs the old in-memory list, as the history grows.
+
+Run from the repo root:  python -m benchmarks.bench_history [--records 200000] [--page 20]
+
+Fills a temporary HistoryStore and a Python list with the same synthetic
+assessments. It then times what a sidebar rerun needs: the newest page, the
+next older page, a name-prefix search, a risk-label filter and opening one
+case. The list column is what session_state.history did: reversed() over
+every record, filtered in Python.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from history_store import HistoryStore
+
+_NAMES = ["Ahmad", "Siti", "John", "Mei Ling", "Ravi", "Nurul", "David", "Aisyah", "Kumar", "Farah"]
+_LABELS = ["Low Risk", "Medium Risk", "High Risk"]
+
+
+def make_record(rng, i):
+    final_risk = round(rng.uniform(0, 100), 1)
+    inputs = {"income": rng.randint(1000, 20000), "loan_amount": rng.randint(1000, 90000), "dti": rng.random(),
+              "age": rng.randint(18, 70), "dependents": rng.randint(0, 4), "loan_term": rng.choice([12, 36, 60]),
+              "credit_history": rng.randint(0, 20), "user_story": "I need this loan to expand my small bakery. " * 3}
+    result = {"Math_Score": final_risk, "Text_Score": 50, "Final_Risk": final_risk,
+              "Text_Analysis": {"purpose_legitimacy": 20, "financial_responsibility": 30, "urgency_desperation": 10,
+                                "clarity": 15, "red_flags": 5, "overall_risk": 20, "confidence": 80,
+                                "explanation": "Clear and specific business purpose. " * 4},
+              "Timings": {"math_ms": 10.0, "text_ms": 900.0}}
+    label = _LABELS[0] if final_risk <= 40 else _LABELS[1] if final_risk <= 60 else _LABELS[2]
+    return inputs, result, label, f"{rng.choice(_NAMES)} {i}"
+
+
+def timed_us(fn, repeat=50):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - start) / repeat * 1e6, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--page", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, "history.sqlite"))
+        history = []
+        start = time.perf_counter()
+        for i in range(args.records):
+            inputs, result, label, name = make_record(rng, i)
+            store.add(inputs, result, label, "Math model predicts LOW risk.", name=name)
+            history.append({"inputs": inputs, "full_result": result, "risk_label": label, "custom_name": name})
+        add_us = (time.perf_counter() - start) / args.records * 1e6
+        size_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 1e6
+
+        first = store.page(args.page)
+        cases = [
+            ("newest page", lambda: store.page(args.page),
+             lambda: list(reversed(history))[:args.page]),
+            ("next older page", lambda: store.page(args.page, before_id=first[-1][0]),
+             lambda: list(reversed(history))[args.page:2 * args.page]),
+            ("name prefix 'ravi 1'", lambda: store.page(args.page, name_prefix="ravi 1"),
+             lambda: [r for r in reversed(history) if r["custom_name"].lower().startswith("ravi 1")][:args.page]),
+            ("label 'High Risk'", lambda: store.page(args.page, risk_label="High Risk"),
+             lambda: [r for r in reversed(history) if r["risk_label"] == "High Risk"][:args.page]),
+            ("open one case", lambda: store.get(first[5][0]), lambda: history[-6]),
+        ]
+        print(f"{args.records:,} assessments: {add_us:.0f} us/add, {size_mb:.0f} MB on disk")
+        print(f"{'query':24s} {'SQLite':>12s} {'list scan':>12s}")
+        for label, sqlite_fn, list_fn in cases:
+            sqlite_us, _ = timed_us(sqlite_fn)
+            list_us, _ = timed_us(list_fn, repeat=5)
+            print(f"{label:24s} {sqlite_us:9.0f} us {list_us:9.0f} us")
+
+
+if __name__ == "__main__":
+    main()
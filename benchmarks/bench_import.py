@@ -0,0 +1,80 @@
+"""Import cost of risk_engine, measured the way `python -X importtime` reports it.
+
+Run from the repo root:  python -m benchmarks.bench_import [--runs 5] [--top 10] [--max-ms 0]
+
+Each run is a fresh interpreter. Reports the wall time of `import risk_engine`,
+the time warmup() adds afterwards, and the slowest modules from -X importtime.
+With --max-ms the script exits non-zero when the median import exceeds it.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+_TIMED_IMPORT = """
+import time
+start = time.perf_counter()
+import risk_engine
+imported = time.perf_counter()
+risk_engine.warmup()
+print((imported - start) * 1000, (time.perf_counter() - imported) * 1000)
+"""
+
+
+def _env():
+    # Offline and quiet: no Gemini key, no unpickle warnings in the numbers
+    return dict(os.environ, GEMINI_API_KEY="", PYTHONWARNINGS="ignore")
+
+
+def timed_runs(runs):
+    imports, warmups = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _TIMED_IMPORT], env=_env(),
+                             capture_output=True, text=True, check=True).stdout.split()
+        imports.append(float(out[-2]))
+        warmups.append(float(out[-1]))
+    return imports, warmups
+
+
+def importtime_breakdown():
+    """(cumulative_us, module) for every module imported by `import risk_engine`."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import risk_engine"], env=_env(),
+                            capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:   <self us> | <cumulative us> | <indented module name>"
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=0, help="fail if the median import takes longer")
+    args = parser.parse_args()
+
+    imports, warmups = timed_runs(args.runs)
+    rows = importtime_breakdown()
+    total = next((cum for cum, _, module in rows if module.strip() == "risk_engine"), None)
+
+    median_import = statistics.median(imports)
+    print(f"import risk_engine : median {median_import:8.1f} ms  (min {min(imports):.1f}, max {max(imports):.1f})")
+    print(f"warmup()           : median {statistics.median(warmups):8.1f} ms")
+    if total is not None:
+        print(f"-X importtime cumulative for risk_engine: {total / 1000:.1f} ms")
+    print(f"Slowest modules by cumulative time (top {args.top}):")
+    for cum, self_us, module in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cum / 1000:8.1f} ms cumulative  {self_us / 1000:7.1f} ms self  {module}")
+
+    if args.max_ms and median_import > args.max_ms:
+        print(f"FAIL: import took {median_import:.1f} ms > {args.max_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Sequential vs bounded-concurrency text analysis against the local Gemini stub.
+
+Run from the repo root:
+    python -m benchmarks.bench_llm [--stories 200] [--latency 0.2] [--error-rate 0.1] [--deadline 2]
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import gemini_stub
+import risk_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stories", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="extra uniform latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="share of calls failing with 429/503")
+    parser.add_argument("--deadline", type=float, default=2.0, help="per-call deadline (s)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    stories = [f"Applicant {i} needs funds to buy equipment for a catering business." for i in range(args.stories)]
+    risk_engine.GEMINI_DEADLINE_S = args.deadline
+    risk_engine.GEMINI_MAX_CONCURRENCY = args.concurrency
+    risk_engine.STORY_CACHE_ENABLED = False  # every call must reach the stub
+    logging.getLogger("risk_engine").setLevel(logging.ERROR)  # retries/fallbacks are expected here
+
+    stub = gemini_stub.StubGenerativeModel(args.latency, args.jitter, args.error_rate, seed=0)
+    risk_engine.model = stub
+    start = time.perf_counter()
+    sequential = [risk_engine._text_risk(s) for s in stories]
+    seq_s = time.perf_counter() - start
+
+    stub = gemini_stub.StubGenerativeModel(args.latency, args.jitter, args.error_rate, seed=0)
+    risk_engine.model = stub
+
+    async def run_all():
+        return await asyncio.gather(*(risk_engine._text_risk_async(s) for s in stories))
+
+    start = time.perf_counter()
+    concurrent = asyncio.run(run_all())
+    async_s = time.perf_counter() - start
+
+    def fallbacks(results):
+        return sum(1 for _, analysis in results if analysis.get("fallback"))
+
+    print(f"sequential : {seq_s:7.2f}s  {args.stories / seq_s:7.1f} stories/s  fallbacks={fallbacks(sequential)}")
+    print(f"async x{args.concurrency:<3}: {async_s:7.2f}s  {args.stories / async_s:7.1f} stories/s  "
+          f"fallbacks={fallbacks(concurrent)}  stub calls={stub.calls} errors={stub.errors}")
+
+
+if __name__ == "__main__":
+    main()
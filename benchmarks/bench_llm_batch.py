@@ -0,0 +1,75 @@
+"""One Gemini request per story vs several stories packed per request, against the local stub.
+
+Run from the repo root:
+    python -m benchmarks.bench_llm_batch [--stories 400] [--latency 0.3] [--per-story 0.01] [--drop-rate 0.05]
+
+The stub charges a fixed latency per request plus a little per story, and
+drops or corrupts --drop-rate of batch entries so the re-queue path is
+exercised. Results from both modes are checked to agree story by story.
+"""
+import argparse
+import logging
+import random
+import time
+
+import gemini_stub
+import risk_engine
+
+_PURPOSES = ["buy equipment for my catering business", "pay for a nursing certification",
+             "cover overdue bills after an unexpected surprise", "repair the roof before the rainy season",
+             "consolidate two card balances into one lower interest loan", "expand my online shop"]
+
+
+def make_stories(n, seed=0):
+    rng = random.Random(seed)
+    # Mixed lengths so the char budget, not just the story cap, decides batch sizes
+    return [f"Applicant {i}: I need the loan to {rng.choice(_PURPOSES)}. " * rng.choice([1, 1, 2, 5, 40])
+            for i in range(n)]
+
+
+def run(stories, stub, batch):
+    risk_engine.model = stub
+    risk_engine.GEMINI_BATCH = batch
+    before = risk_engine.story_batch_stats()
+    start = time.perf_counter()
+    results = risk_engine._analyse_stories(stories)
+    elapsed = time.perf_counter() - start
+    after = risk_engine.story_batch_stats()
+    return results, elapsed, {k: after[k] - before[k] for k in after}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stories", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub latency per request (s)")
+    parser.add_argument("--per-story", type=float, default=0.01, help="extra stub latency per story (s)")
+    parser.add_argument("--drop-rate", type=float, default=0.05, help="share of batch entries missing or malformed")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    risk_engine.GEMINI_MAX_CONCURRENCY = args.concurrency
+    risk_engine.GEMINI_DEADLINE_S = 120  # queueing behind the concurrency cap must not turn into fallbacks
+    risk_engine.STORY_CACHE_ENABLED = False  # every story must reach the stub
+    logging.getLogger("risk_engine").setLevel(logging.ERROR)
+    stories = make_stories(args.stories)
+
+    single_stub = gemini_stub.StubGenerativeModel(args.latency, per_story_s=args.per_story, seed=0)
+    single, single_s, _ = run(stories, single_stub, batch=False)
+    batch_stub = gemini_stub.StubGenerativeModel(args.latency, per_story_s=args.per_story,
+                                                 drop_rate=args.drop_rate, seed=0)
+    batched, batch_s, stats = run(stories, batch_stub, batch=True)
+
+    batches = risk_engine._pack_story_batches(stories)
+    sizes = sorted(len(b) for b in batches)
+    mismatched = sum(1 for story in stories if single[story][0] != batched[story][0])
+    fallbacks = sum(1 for _, analysis in batched.values() if analysis.get("fallback"))
+    print(f"Stories: {len(stories)}, batch sizes min/median/max {sizes[0]}/{sizes[len(sizes) // 2]}/{sizes[-1]} "
+          f"(cap {risk_engine.GEMINI_BATCH_MAX_STORIES} stories, {risk_engine.GEMINI_BATCH_MAX_CHARS} chars)")
+    print(f"single  : {single_s:7.2f}s  {len(stories) / single_s:7.1f} stories/s  requests={single_stub.calls}")
+    print(f"batched : {batch_s:7.2f}s  {len(stories) / batch_s:7.1f} stories/s  requests={batch_stub.calls} "
+          f"(batched {stats['requests']}, re-queued stories {stats['requeued']})")
+    print(f"Score mismatches between modes: {mismatched}, keyword fallbacks in batched mode: {fallbacks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Interactive Gemini latency while a bulk job saturates the quota, with and without the scheduler.
+
+Run from the repo root:
+    python -m benchmarks.bench_llm_scheduler [--rpm 1200] [--bulk 200] [--interactive 15] [--interval 0.5]
+
+The stub enforces --rpm like the real endpoint (429 once the quota is spent).
+A bulk _analyse_stories run floods it from a background thread while
+single-story _text_risk calls (the path behind "Predict Risk") arrive every
+--interval seconds. Without a scheduler the clicks race the bulk job for
+quota and fall back to keywords on a 429. With GEMINI_RPM set just under
+the quota they queue ahead of all bulk work.
+"""
+import argparse
+import json
+import logging
+import statistics
+import threading
+import time
+
+import gemini_stub
+import risk_engine
+
+
+def scenario(args, rpm):
+    risk_engine.GEMINI_RPM = rpm
+    risk_engine._llm_scheduler = None
+    stub = gemini_stub.StubGenerativeModel(args.latency, quota_rpm=args.rpm, seed=0)
+    risk_engine.model = stub
+    bulk_stories = [f"Bulk applicant {i} wants to expand a bakery business." for i in range(args.bulk)]
+
+    bulk_results = {}
+    bulk = threading.Thread(target=lambda: bulk_results.update(risk_engine._analyse_stories(bulk_stories)))
+    bulk.start()
+    time.sleep(args.interval)
+
+    latencies, fallbacks = [], 0
+    for i in range(args.interactive):
+        start = time.perf_counter()
+        _, analysis = risk_engine._text_risk(f"Interactive applicant {i} needs equipment for a clinic.")
+        latencies.append((time.perf_counter() - start) * 1000)
+        fallbacks += bool(analysis.get("fallback"))
+        time.sleep(args.interval)
+    bulk.join()
+
+    bulk_fallbacks = sum(1 for _, analysis in bulk_results.values() if analysis.get("fallback"))
+    latencies.sort()
+    return {
+        "interactive_p50_ms": round(statistics.median(latencies), 1),
+        "interactive_max_ms": round(latencies[-1], 1),
+        "interactive_fallbacks": fallbacks,
+        "bulk_fallbacks": bulk_fallbacks,
+        "stub_429s": stub.rate_limited,
+        "scheduler": risk_engine.llm_scheduler_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rpm", type=float, default=1200, help="quota enforced by the stub")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per call (s)")
+    parser.add_argument("--bulk", type=int, default=200, help="stories in the bulk job")
+    parser.add_argument("--interactive", type=int, default=15, help="single-story requests during the bulk job")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between interactive requests")
+    args = parser.parse_args()
+
+    risk_engine.STORY_CACHE_ENABLED = False
+    risk_engine.GEMINI_MAX_CONCURRENCY = 16
+    logging.getLogger("risk_engine").setLevel(logging.ERROR)
+
+    for label, rpm in (("no scheduler", 0), ("scheduler", args.rpm * 0.95)):
+        result = scenario(args, rpm)
+        scheduler = result.pop("scheduler")
+        print(f"{label:12s}: " + ", ".join(f"{k}={v}" for k, v in result.items()))
+        if scheduler:
+            print("              " + json.dumps({k: scheduler[k] for k in ("interactive", "bulk")}))
+
+
+if __name__ == "__main__":
+    main()
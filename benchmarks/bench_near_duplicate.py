@@ -0,0 +1,84 @@
+"""Near-duplicate story index: insert/lookup speed, recall and false matches as it grows.
+
+Run from the repo root:  python -m benchmarks.bench_near_duplicate [--stories 200000] [--queries 2000]
+
+Stores --stories synthetic stories in a temporary SQLite index. It then looks
+up --queries variants of stored stories (new name, amount and punctuation,
+which should match) and --queries unrelated stories (which should not). It
+reports per-call latency, recall, false matches, file size and peak RSS.
+"""
+import argparse
+import os
+import random
+import resource
+import string
+import tempfile
+import time
+
+from near_duplicate import NearDuplicateIndex
+
+_NAMES = ["Ahmad", "Siti", "John", "Mei Ling", "Ravi", "Nurul", "David", "Aisyah", "Kumar", "Farah"]
+_PLACES = ["Muar", "Cyberjaya", "Ipoh", "Penang", "Kuching", "Melaka"]
+
+
+def make_vocabulary(rng, size=3000):
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def make_story(rng, vocabulary):
+    body = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(12, 30)))
+    return (f"My name is {rng.choice(_NAMES)} from {rng.choice(_PLACES)} and I need RM {rng.randint(1, 90)},000 "
+            f"because {body}.")
+
+
+def perturb(rng, story):
+    # Same story told by someone else: other name, place, amount and punctuation
+    words = story.split()
+    words[3] = rng.choice(_NAMES) + ","
+    words[5] = rng.choice(_PLACES)
+    words[10] = f"{rng.randint(1, 90)},{rng.randint(0, 999):03d}"
+    return " ".join(words).replace(".", "!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stories", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "near_dup.sqlite")
+        index = NearDuplicateIndex(path, threshold=args.threshold, max_items=args.stories)
+        stored = []
+        start = time.perf_counter()
+        for i in range(args.stories):
+            story = make_story(rng, vocabulary)
+            index.add(f"key-{i}", story, "v1")
+            if i % max(1, args.stories // args.queries) == 0:
+                stored.append((f"key-{i}", story))
+        add_us = (time.perf_counter() - start) / args.stories * 1e6
+
+        variants = [(key, perturb(rng, story)) for key, story in stored[:args.queries]]
+        start = time.perf_counter()
+        found = [index.find(story, "v1") for _, story in variants]
+        find_us = (time.perf_counter() - start) / len(variants) * 1e6
+        recall = sum(1 for (key, _), hit in zip(variants, found) if hit and hit["key"] == key) / len(variants)
+
+        unrelated = [make_story(rng, vocabulary) for _ in range(args.queries)]
+        false_matches = sum(1 for story in unrelated if index.find(story, "v1") is not None)
+        other_prompt = sum(1 for _, story in variants[:200] if index.find(story, "v2") is not None)
+
+        size_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 1e6
+        print(f"Indexed {len(index):,} stories: {add_us:.0f} us/add, file {size_mb:.0f} MB, "
+              f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+        print(f"Lookup: {find_us:.0f} us/find")
+        print(f"Recall on name/amount/punctuation variants : {recall:.1%}")
+        print(f"False matches on unrelated stories         : {false_matches} / {len(unrelated)}")
+        print(f"Matches across prompt versions             : {other_prompt} / 200")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Similar-applicant lookups: KD-tree index vs a brute-force scan, as the history grows.
+
+Run from the repo root:  python -m benchmarks.bench_similar [--rows 2000,100000,1000000] [--queries 300]
+
+Sizes above the 2,000 rows of cleaned_data.csv are made by resampling its
+rows with a little noise on every feature. For each size the script reports
+the build time, the file size, the memory-mapped load time, the latency of
+one query() (k=10, with the neighbour rows the app shows), batched
+throughput, and the same k=10 found by a NumPy scan over every row.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import similar_applicants
+from risk_engine import FEATURE_COLUMNS
+
+
+def synthetic_history(base, rows, rng):
+    if rows <= len(base):
+        return base.iloc[:rows].reset_index(drop=True)
+    frame = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+    noise = rng.normal(0, 0.05, (rows, len(FEATURE_COLUMNS))) * base[FEATURE_COLUMNS].std().to_numpy()
+    frame[FEATURE_COLUMNS] = frame[FEATURE_COLUMNS].to_numpy(dtype=float) + noise
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="2000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = similar_applicants.read_history(["cleaned_data.csv"])
+    applicants = base[FEATURE_COLUMNS].to_numpy(dtype=float)[rng.integers(0, len(base), args.queries)]
+    print(f"{'rows':>10s} {'build s':>8s} {'MB':>6s} {'load ms':>8s} {'query us':>9s} {'batch q/s':>10s} "
+          f"{'scan us':>9s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in [int(r) for r in args.rows.split(",")]:
+            frame = synthetic_history(base, rows, rng)
+            path = os.path.join(tmp, f"similar_{rows}.joblib")
+            start = time.perf_counter()
+            similar_applicants.SimilarApplicants.build(frame).save(path)
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index = similar_applicants.SimilarApplicants.load(path)
+            load_ms = (time.perf_counter() - start) * 1000
+
+            index.query(applicants[0], k=args.k)
+            start = time.perf_counter()
+            for applicant in applicants:
+                index.query(applicant, k=args.k)
+            query_us = (time.perf_counter() - start) / len(applicants) * 1e6
+
+            start = time.perf_counter()
+            index.query_batch(applicants, k=args.k)
+            batch_qps = len(applicants) / (time.perf_counter() - start)
+
+            # Brute force over the same standardized rows, with argpartition for the k smallest
+            data = np.asarray(index.tree.get_arrays()[0])
+            scan = applicants[:max(3, len(applicants) // 10)]
+            start = time.perf_counter()
+            for applicant in scan:
+                d = ((data - index._standardize(applicant)) ** 2).sum(axis=1)
+                nearest = np.argpartition(d, args.k)[:args.k]
+                index.default[nearest].mean()
+            scan_us = (time.perf_counter() - start) / len(scan) * 1e6
+
+            print(f"{rows:>10,d} {build_s:8.2f} {os.path.getsize(path) / 1e6:6.1f} {load_ms:8.1f} {query_us:9.0f} "
+                  f"{batch_qps:10,.0f} {scan_us:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Summary-image renders per second with cold caches (the old behaviour) and warm ones.
+
+Run from the repo root:  python -m benchmarks.bench_summary_image [--renders 300]
+
+"cold" clears the font cache and the template before each render, so every
+render loads all seven fonts and draws the whole layout, as
+create_summary_image used to. "warm" reuses both. The PNG encode is timed
+on its own, since the cache cannot speed it up.
+"""
+import argparse
+import io
+import random
+import time
+
+from PIL import Image
+
+import reports
+
+
+def make_case(rng, i):
+    data = {"income": rng.randint(1000, 20000), "loan_amount": rng.randint(1000, 90000),
+            "dti": rng.random(), "credit_history": rng.randint(0, 20)}
+    analysis = {key: rng.randint(0, 100) for key in reports.INDICATOR_KEYS}
+    analysis.update(confidence=rng.randint(50, 95),
+                    explanation=" ".join(rng.choice(["stable", "income", "bakery", "expansion", "urgent", "loan",
+                                                     "repayment", "plan", "clear"]) for _ in range(rng.randint(5, 60))))
+    return data, {"Final_Risk": round(rng.uniform(0, 100), 2), "Text_Analysis": analysis}, f"Case {i}"
+
+
+def renders_per_s(cases, cold):
+    start = time.perf_counter()
+    for case in cases:
+        if cold:
+            reports.get_font.cache_clear()
+            reports._summary_template.cache_clear()
+        reports.create_summary_image(*case)
+    return len(cases) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--renders", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cases = [make_case(rng, i) for i in range(args.renders)]
+    reports.create_summary_image(*cases[0])
+    cold = renders_per_s(cases, cold=True)
+    warm = renders_per_s(cases, cold=False)
+
+    png = reports.create_summary_image(*cases[0])
+    img = Image.open(io.BytesIO(png))
+    img.load()
+    start = time.perf_counter()
+    for _ in range(50):
+        img.save(io.BytesIO(), format="PNG")
+    encode_ms = (time.perf_counter() - start) / 50 * 1000
+
+    print(f"cold caches : {cold:7.1f} renders/s ({1000 / cold:6.2f} ms each)")
+    print(f"warm caches : {warm:7.1f} renders/s ({1000 / warm:6.2f} ms each), {warm / cold:.1f}x")
+    print(f"  of which PNG encode {encode_ms:.2f} ms, {len(png) / 1024:.0f} KB per image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Local text model: agreement with Gemini on held-out stories and per-story latency.
+
+Run from the repo root:  python -m benchmarks.bench_text_model [--stories 5000] [--holdout 0.2]
+
+Synthetic stories are analysed through the normal Gemini path against the
+local stub, which fills a temporary story cache. The model is distilled from
+that cache exactly as `python text_model.py train` would do it. The script
+then prints the held-out agreement report and the per-story latency of the
+local model, the keyword fallback and get_total_risk with
+RISK_TEXT_BACKEND=local. The stub labels stories from keyword matches, so this
+measures how well the distillation reproduces its teacher. Agreement with the
+real Gemini has to be read off the report of a model trained on real
+analyses.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+import gemini_stub
+import risk_engine
+import text_model
+
+_OPENINGS = ["I am applying because", "Hello, I would like a loan since", "To be honest,", "My situation is that",
+             "I run a small stall and", "As a nurse,", "After my divorce,"]
+_PURPOSES = ["I want to buy equipment for my catering business", "I need to pay for a nursing certification",
+             "I must cover overdue bills after an unexpected surprise", "the roof needs repair before the rains",
+             "I want a consolidation loan at lower interest", "I plan an expansion of my online shop",
+             "I owe money to a loan shark and it is urgent", "I lost a lot at the casino and need cash immediately",
+             "there is a lawsuit and a court fine to pay", "I need medical treatment for my mother",
+             "it is for personal reasons I would rather not say", "I want to start a venture with a friend",
+             "I had a late payment and need to catch up", "my degree fees are due next month"]
+_DETAILS = ["I have a stable job.", "My income is irregular.", "I will repay within two years.",
+            "Please help, this is desperate.", "My family depends on me.", "I have never missed a payment.",
+            "The payday lender keeps calling.", "I can show receipts for everything.", ""]
+
+
+def make_stories(n, seed=0):
+    rng = random.Random(seed)
+    stories = set()
+    while len(stories) < n:
+        parts = [rng.choice(_OPENINGS), rng.choice(_PURPOSES) + "."]
+        parts += rng.sample(_DETAILS, rng.randint(0, 3))
+        if rng.random() < 0.5:
+            parts.append(rng.choice(_PURPOSES).capitalize() + " as well.")
+        parts.append(f"Ref {rng.randint(0, 10 ** 6)}.")
+        stories.add(" ".join(p for p in parts if p))
+    return sorted(stories)
+
+
+def per_story_us(fn, stories):
+    start = time.perf_counter()
+    for story in stories:
+        fn(story)
+    return (time.perf_counter() - start) / len(stories) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stories", type=int, default=5000)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--timed", type=int, default=2000, help="stories timed per scorer")
+    args = parser.parse_args()
+
+    logging.getLogger("risk_engine").setLevel(logging.ERROR)
+    stories = make_stories(args.stories)
+    with tempfile.TemporaryDirectory() as tmp:
+        risk_engine.STORY_CACHE_PATH = os.path.join(tmp, "story_cache.sqlite")
+        risk_engine.GEMINI_MAX_CONCURRENCY = 32
+        risk_engine.model = gemini_stub.StubGenerativeModel(latency_s=0.0, seed=0)
+        start = time.perf_counter()
+        risk_engine._analyse_stories(stories)
+        print(f"Labelled {len(stories):,} stories through the stubbed Gemini path in "
+              f"{time.perf_counter() - start:.1f}s")
+
+        examples = list(text_model.examples_from_cache(risk_engine.STORY_CACHE_PATH))
+        model = text_model.train(examples, holdout=args.holdout)
+        path = os.path.join(tmp, "text_model.joblib")
+        model.save(path)
+        report = model.report
+        print(f"Trained on {report['train_stories']:,}, held out {report['holdout_stories']:,} "
+              f"in {report['train_time_s']}s; model file {os.path.getsize(path) / 1e6:.1f} MB")
+        print(json.dumps(report["holdout"], indent=2))
+        print(f"Single-story path vs batch path max diff: {report['single_path_max_diff']:.2e}")
+
+        risk_engine.TEXT_BACKEND = "local"
+        risk_engine.TEXT_MODEL_PATH = path
+        timed = make_stories(args.timed, seed=1)
+        risk_engine.text_model = text_model.LocalTextModel.load(path)
+        local_us = per_story_us(risk_engine._text_risk, timed)
+        keyword_us = per_story_us(risk_engine._fallback_text_risk, timed)
+        start = time.perf_counter()
+        risk_engine._analyse_stories(timed)
+        batch_us = (time.perf_counter() - start) / len(timed) * 1e6
+        applicant = (30, 5000, 10000, 36, 0.3, 5, 0)
+        risk_engine.get_total_risk(*applicant, timed[0])
+        total_us = per_story_us(lambda story: risk_engine.get_total_risk(*applicant, story), timed[:300])
+        print(f"Local model, one story       : {local_us:8.1f} us")
+        print(f"Local model, batch per story : {batch_us:8.1f} us")
+        print(f"Keyword fallback, one story  : {keyword_us:8.1f} us")
+        print(f"get_total_risk (local text)  : {total_us:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
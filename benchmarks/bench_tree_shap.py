@@ -0,0 +1,84 @@
+"""TreeSHAP explanations of the Random Forest: table build, exactness and latency.
+
+Run from the repo root:  python -m benchmarks.bench_tree_shap [--rows 300] [--check 3]
+
+Builds tree_shap.ForestExplainer from baseline_model_rf.pkl and reports:
+- the build time and table size;
+- the largest efficiency error over cleaned_data.csv
+  (|expected value + contributions - predict_proba|);
+- the largest difference from a brute-force reference on --check applicants.
+  The reference evaluates v(S) recursively on the sklearn trees for all 128
+  feature subsets and applies the Shapley formula directly;
+- per-applicant latency (shap_row) and batched throughput (shap_batch).
+"""
+import argparse
+import math
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from risk_engine import FEATURE_COLUMNS, RF_MODEL_PATH
+from tree_shap import ForestExplainer
+
+
+def _tree_v(tree, x, known, node=0):
+    # Path-dependent expectation: follow x on known features, cover-weight both children otherwise
+    left, right = tree.children_left[node], tree.children_right[node]
+    if left == -1:
+        return tree.value[node, 0, 1] / tree.value[node, 0, :].sum()
+    if tree.feature[node] in known:
+        return _tree_v(tree, x, known, left if x[tree.feature[node]] <= tree.threshold[node] else right)
+    cover = tree.weighted_n_node_samples
+    return (cover[left] * _tree_v(tree, x, known, left) + cover[right] * _tree_v(tree, x, known, right)) / cover[node]
+
+
+def brute_force_shap(forest, x):
+    m = forest.n_features_in_
+    x = np.asarray(x, dtype=np.float32).astype(np.float64)
+    v = [np.mean([_tree_v(e.tree_, x, {f for f in range(m) if s >> f & 1}) for e in forest.estimators_])
+         for s in range(1 << m)]
+    phi = np.zeros(m)
+    for i in range(m):
+        for s in range(1 << m):
+            if not s >> i & 1:
+                size = bin(s).count("1")
+                phi[i] += math.factorial(size) * math.factorial(m - size - 1) / math.factorial(m) * (v[s | 1 << i] - v[s])
+    return phi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=300, help="applicants timed one at a time")
+    parser.add_argument("--check", type=int, default=3, help="applicants compared with the brute-force reference")
+    args = parser.parse_args()
+
+    forest = joblib.load(RF_MODEL_PATH)
+    X = pd.read_csv("cleaned_data.csv")[FEATURE_COLUMNS].to_numpy(dtype=float)
+
+    start = time.perf_counter()
+    explainer = ForestExplainer.from_sklearn(forest)
+    build_s = time.perf_counter() - start
+    print(f"{forest.n_estimators} trees, {explainer.n_leaves:,} leaves: tables built in {build_s:.2f}s, "
+          f"{explainer.table.nbytes / 1e6:.0f} MB")
+
+    print(f"efficiency error over {len(X):,} rows: {explainer.max_abs_error(forest, X):.2e}")
+    reference_error = max(np.abs(brute_force_shap(forest, x) - explainer.shap_row(x)).max() for x in X[:args.check])
+    print(f"max |table - brute force| over {args.check} rows: {reference_error:.2e}")
+
+    explainer.shap_row(X[0])
+    rows = X[:args.rows]
+    start = time.perf_counter()
+    for x in rows:
+        explainer.shap_row(x)
+    row_ms = (time.perf_counter() - start) / len(rows) * 1000
+    start = time.perf_counter()
+    explainer.shap_batch(X)
+    batch_s = time.perf_counter() - start
+    print(f"shap_row   : {row_ms:.3f} ms per applicant")
+    print(f"shap_batch : {len(X) / batch_s:,.0f} applicants/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""How often the LR -> forest cascade avoids the Random Forest, and what it costs in decisions.
+
+Run from the repo root:  python -m benchmarks.cascade_report [--data cleaned_data.csv] [--bands 0 5 10 15 20]
+
+For each uncertainty band the math score is taken from the Logistic
+Regression unless it lands within the band of a cut-off, in which case the
+forest scores the row. Decisions are compared with forest-only scoring,
+both on the math score alone and fused with the offline text score
+(the `user_story` column if there is one, else the empty-story fallback).
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+import risk_engine
+
+DECISIONS = ["APPROVE", "MANUAL REVIEW", "REJECT"]
+
+
+def _decisions(final_scores):
+    return pd.Series(np.round(final_scores, 1)).map(risk_engine.decision_for)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="cleaned_data.csv")
+    parser.add_argument("--bands", type=float, nargs="+", default=[0, 5, 10, 15, 20])
+    args = parser.parse_args()
+    logging.getLogger("risk_engine").setLevel(logging.ERROR)
+
+    df = pd.read_csv(args.data)
+    X = df[risk_engine.FEATURE_COLUMNS].to_numpy(dtype=float)
+    stories = df["user_story"].fillna("").astype(str) if "user_story" in df.columns else pd.Series("", index=df.index)
+    text_scores = stories.map(lambda story: risk_engine._fallback_text_risk(story)[0]).to_numpy(dtype=float)
+
+    risk_engine._forest_risk_scores(df.head(1))  # keep one-off model loading out of the timing
+    start = time.perf_counter()
+    forest = risk_engine._forest_risk_scores(df)
+    forest_ms = (time.perf_counter() - start) * 1000
+    lr = risk_engine._lr_risk_scores(X)
+
+    forest_math = _decisions(forest)
+    forest_final = _decisions(forest * risk_engine.MATH_WEIGHT + text_scores * risk_engine.TEXT_WEIGHT)
+
+    print(f"Rows: {len(df):,}   thresholds: review > {risk_engine.REVIEW_THRESHOLD}, "
+          f"reject > {risk_engine.REJECT_THRESHOLD}   forest-only batch: {forest_ms:.1f} ms")
+    print(f"{'band':>6} {'forest avoided':>15} {'math agree':>11} {'final agree':>12} {'mean |diff|':>12} {'batch ms':>9}")
+    for band in args.bands:
+        start = time.perf_counter()
+        cascade = risk_engine._cascade_risk_scores(df, band=band)
+        cascade_ms = (time.perf_counter() - start) * 1000
+        avoided = 1 - risk_engine.in_uncertainty_band(lr, band).mean()
+        math_agree = (_decisions(cascade) == forest_math).mean()
+        final_agree = (_decisions(cascade * risk_engine.MATH_WEIGHT
+                                  + text_scores * risk_engine.TEXT_WEIGHT) == forest_final).mean()
+        print(f"{band:6.1f} {avoided:15.1%} {math_agree:11.2%} {final_agree:12.2%} "
+              f"{np.abs(cascade - forest).mean():12.2f} {cascade_ms:9.1f}")
+
+    cascade = risk_engine._cascade_risk_scores(df)
+    print(f"\nMath decisions at the configured band ({risk_engine.CASCADE_BAND:g}): rows = forest-only, "
+          f"columns = cascade")
+    table = pd.crosstab(forest_math.rename("forest"), _decisions(cascade).rename("cascade"))
+    print(table.reindex(index=DECISIONS, columns=DECISIONS, fill_value=0).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""How much of cleaned_data.csv the early-exit mode would keep away from Gemini.
+
+Run from the repo root:  python -m benchmarks.short_circuit_report [--data cleaned_data.csv]
+"""
+import argparse
+
+import pandas as pd
+
+import risk_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="cleaned_data.csv")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    math_scores = pd.Series(risk_engine._math_risk_scores(df), index=df.index)
+    decided = risk_engine._math_decides_batch(math_scores)
+    approve_below, reject_above = risk_engine.decision_bounds()
+
+    # With the text score pinned at either extreme the decision is the same, so either works here
+    decisions = (math_scores[decided] * risk_engine.MATH_WEIGHT).round(1).map(risk_engine.decision_for)
+
+    print(f"Weights: math {risk_engine.MATH_WEIGHT}, text {risk_engine.TEXT_WEIGHT}; "
+          f"thresholds: review > {risk_engine.REVIEW_THRESHOLD}, reject > {risk_engine.REJECT_THRESHOLD}")
+    print(f"Math score decides alone when <= {approve_below:.2f} (APPROVE) or > {reject_above:.2f} (REJECT)")
+    print(f"Rows                     : {len(df):,}")
+    print(f"LLM call avoided         : {decided.sum():,} ({decided.mean():.1%})")
+    print(f"  of which APPROVE       : {(decisions == 'APPROVE').sum():,}")
+    print(f"  of which REJECT        : {(decisions == 'REJECT').sum():,}")
+    print(f"LLM call still needed    : {(~decided).sum():,} ({(~decided).mean():.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""End-to-end benchmark suite: engine stages, forest inference and report renderers, offline.
+
+Run from the repo root:
+    python -m benchmarks.suite                      # run, compare with benchmarks/baseline.json
+    python -m benchmarks.suite --save-baseline      # run and make the result the new baseline
+    python -m benchmarks.suite --only rf_single,pdf_report --scale 0.2 --out results.json
+
+Every case runs in its own child process, so its peak RSS is its own. Gemini
+is replaced by gemini_stub and the story cache is off, so nothing leaves the
+machine and every call does the full work. Each case reports per-call
+latency percentiles (p50/p95/p99 in ms), throughput and peak RSS as JSON.
+
+Compared with the baseline, a case regresses when its p50 or p95 latency
+grows, or its throughput drops, by more than --tolerance. Peak RSS has to
+grow by more than --rss-tolerance. Any regression is printed and the exit
+status is 1. The saved baseline belongs to the machine that recorded it;
+re-save it (--save-baseline) on the machine that runs the gate.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STORIES = [
+    "I need this loan to expand my small bakery business.",
+    "I owe money to a loan shark and need cash immediately, it is urgent.",
+    "Medical treatment for my mother, we have some savings but not enough.",
+    "I want to pay for a nursing certification so I can get a better job at the hospital.",
+    "Personal reasons, I would rather not say.",
+]
+# Engine switches that change what get_total_risk does; recorded next to the results
+_CONFIG_ENV = ("RISK_EARLY_EXIT", "RISK_INFERENCE_BACKEND", "RISK_CASCADE", "RISK_GEMINI_BATCH", "RISK_NEAR_DUP",
+               "RISK_TEXT_BACKEND", "GEMINI_RPM")
+
+
+def _applicants(n):
+    import pandas as pd
+    df = pd.read_csv("cleaned_data.csv")
+    rows = df[["age", "monthly_income", "loan_amount", "loan_term", "dti", "credit_history", "num_dependents"]]
+    rows = rows.to_numpy().tolist()
+    return [rows[i % len(rows)] + [STORIES[i % len(STORIES)]] for i in range(n)]
+
+
+def _use_stub(latency_s):
+    import gemini_stub
+    import risk_engine
+    risk_engine.model = gemini_stub.StubGenerativeModel(latency_s=latency_s, seed=0)
+
+
+def _no_gemini():
+    import risk_engine
+    risk_engine.model = None
+
+
+def _report_inputs(n):
+    import risk_engine
+    risk_engine.model = None
+    records = []
+    for age, income, loan, term, dti, history, dependents, story in _applicants(n):
+        data = {"income": int(income), "loan_amount": int(loan), "dti": dti, "age": int(age),
+                "dependents": int(dependents), "loan_term": int(term), "credit_history": int(history),
+                "user_story": story}
+        result = risk_engine.get_total_risk(age, income, loan, term, dti, history, dependents, story)
+        records.append((data, result, f"Case {len(records) + 1}"))
+    return records
+
+
+# --- Cases: each returns (calls, units per call, unit) where calls are zero-argument callables ---
+
+def case_math_only(n, args):
+    import risk_engine
+    return [lambda row=row: risk_engine._math_risk_score_row(row[:7]) for row in _applicants(n)], 1, "rows"
+
+
+def case_text_fallback(n, args):
+    import risk_engine
+    return [lambda story=row[7]: risk_engine._fallback_text_risk(story) for row in _applicants(n)], 1, "stories"
+
+
+def case_text_stub_llm(n, args):
+    import risk_engine
+    _use_stub(args.llm_latency)
+    return [lambda story=row[7]: risk_engine._text_risk(story) for row in _applicants(n)], 1, "stories"
+
+
+def case_total_risk_fallback(n, args):
+    import risk_engine
+    _no_gemini()
+    return [lambda row=row: risk_engine.get_total_risk(*row) for row in _applicants(n)], 1, "applicants"
+
+
+def case_total_risk_stub_llm(n, args):
+    import risk_engine
+    _use_stub(args.llm_latency)
+    return [lambda row=row: risk_engine.get_total_risk(*row) for row in _applicants(n)], 1, "applicants"
+
+
+def case_rf_single(n, args):
+    import risk_engine
+    rows = [row[:7] for row in _applicants(n)]
+    return [lambda row=row: risk_engine._forest_risk_score_row(row) for row in rows], 1, "rows"
+
+
+def case_rf_batch(n, args):
+    import pandas as pd
+    import risk_engine
+    frame = pd.read_csv("cleaned_data.csv")[risk_engine.FEATURE_COLUMNS]
+    return [lambda: risk_engine._forest_risk_scores(frame) for _ in range(n)], len(frame), "rows"
+
+
+def case_math_explain(n, args):
+    import risk_engine
+    risk_engine.get_explainer()
+    return [lambda row=row: risk_engine.explain_math_score_row(row[:7]) for row in _applicants(n)], 1, "rows"
+
+
+def case_pdf_report(n, args):
+    import reports
+    records = _report_inputs(n)
+    return [lambda r=r: reports.create_pdf_report(r[0], r[1], r[2], "Math model predicts LOW risk.")
+            for r in records], 1, "reports"
+
+
+def case_summary_image(n, args):
+    import reports
+    records = _report_inputs(n)
+    return [lambda r=r: reports.create_summary_image(*r) for r in records], 1, "images"
+
+
+# name -> (builder, calls at --scale 1)
+CASES = {
+    "math_only": (case_math_only, 300),
+    "text_fallback": (case_text_fallback, 3000),
+    "text_stub_llm": (case_text_stub_llm, 300),
+    "total_risk_fallback": (case_total_risk_fallback, 200),
+    "total_risk_stub_llm": (case_total_risk_stub_llm, 200),
+    "rf_single": (case_rf_single, 300),
+    "rf_batch": (case_rf_batch, 10),
+    "math_explain": (case_math_explain, 300),
+    "pdf_report": (case_pdf_report, 100),
+    "summary_image": (case_summary_image, 100),
+}
+
+
+def run_case(name, args):
+    """Time one case in this process and return its result dict."""
+    builder, calls_at_scale_1 = CASES[name]
+    n = max(3, int(calls_at_scale_1 * args.scale))
+    calls, units, unit = builder(n + args.warmup, args)
+    for call in calls[:args.warmup]:
+        call()
+    latencies = []
+    start = time.perf_counter()
+    for call in calls[args.warmup:]:
+        t0 = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "throughput": round(len(latencies) * units / elapsed, 2),
+        "throughput_unit": f"{unit}/s",
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_isolated(name, args):
+    cmd = [sys.executable, "-W", "ignore", "-m", "benchmarks.suite", "--case", name, "--scale", str(args.scale),
+           "--warmup", str(args.warmup), "--llm-latency", str(args.llm_latency)]
+    out = subprocess.run(cmd, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"case {name} failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpus": os.cpu_count(),
+        "config": {key: os.environ[key] for key in _CONFIG_ENV if key in os.environ},
+    }
+
+
+def compare(results, baseline, tolerance, rss_tolerance):
+    """Human-readable regressions of `results` against `baseline` (an empty list means none)."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {current[metric]} "
+                                   f"(+{current[metric] / base[metric] - 1:.0%})")
+        if current["throughput"] < base["throughput"] / (1 + tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']} -> {current['throughput']} "
+                               f"{current['throughput_unit']}")
+        if current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_tolerance):
+            regressions.append(f"{name}: peak RSS {base['peak_rss_mb']} -> {current['peak_rss_mb']} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help="comma-separated case names (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every case's call count")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed calls per case")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="stub Gemini latency per call (s)")
+    parser.add_argument("--out", help="write the results JSON here as well")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed latency/throughput regression")
+    parser.add_argument("--rss-tolerance", type=float, default=0.15, help="allowed peak-RSS growth")
+    parser.add_argument("--case", help=argparse.SUPPRESS)  # internal: run one case, print its JSON
+    args = parser.parse_args()
+
+    if args.case:
+        logging.disable(logging.WARNING)
+        import risk_engine
+        risk_engine.STORY_CACHE_ENABLED = False
+        print(json.dumps(run_case(args.case, args)))
+        return 0
+
+    names = args.only.split(",") if args.only else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}; choose from {', '.join(CASES)}")
+
+    results = {}
+    print(f"{'case':22s} {'p50 ms':>10s} {'p95 ms':>10s} {'p99 ms':>10s} {'throughput':>22s} {'peak RSS':>10s}")
+    for name in names:
+        r = results[name] = run_isolated(name, args)
+        print(f"{name:22s} {r['p50_ms']:10.3f} {r['p95_ms']:10.3f} {r['p99_ms']:10.3f} "
+              f"{r['throughput']:>12,.1f} {r['throughput_unit']:9s} {r['peak_rss_mb']:7.0f} MB")
+
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "scale": args.scale,
+              "llm_latency_s": args.llm_latency, "environment": environment(), "cases": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        if os.path.exists(args.baseline) and args.only:
+            with open(args.baseline) as f:
+                saved = json.load(f)
+            saved["cases"].update(results)
+            report = dict(report, cases=saved["cases"])
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("scale") != args.scale or baseline.get("llm_latency_s") != args.llm_latency:
+        print("⚠️ Baseline was recorded with a different --scale/--llm-latency; percentiles may not compare")
+    if baseline.get("environment", {}) != report["environment"]:
+        print(f"⚠️ Baseline was recorded on {baseline.get('environment')}; this run is {report['environment']}")
+    regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%}, RSS {args.rss_tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
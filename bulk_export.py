@@ -0,0 +1,200 @@
+"""Bulk report export: PDFs and PNG summaries for many scored records, streamed into one ZIP.
+
+    python bulk_export.py reports.zip --history history.sqlite
+    python bulk_export.py reports.zip --scored scored.jsonl --workers 4 --kinds pdf
+
+Records are read lazily (the app's history database, or `python -m risk_engine
+score` output in CSV/JSONL) and sent in small chunks to a process pool. Each
+worker renders the PDF and/or PNG for its chunk with reports.py, keeping its
+fonts and the summary-image template cached. Finished chunks are written into
+the ZIP in input order as soon as they arrive. At most two chunks per worker
+are in flight, so memory stays flat however many records are exported. An
+index.csv with each case's name, score and decision is spooled to a temporary
+file and added last. The ZIP is built under `<out>.part` and renamed when
+complete. Progress and throughput go to stderr.
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import reports
+import risk_engine
+
+KINDS = ("pdf", "png")
+_UNSAFE_NAME_RE = re.compile(r"[^\w.-]+")
+# Score-output column -> report input key (see app.py's record "inputs")
+_INPUT_COLUMNS = {"monthly_income": "income", "loan_amount": "loan_amount", "dti": "dti", "age": "age",
+                  "num_dependents": "dependents", "loan_term": "loan_term", "credit_history": "credit_history"}
+
+
+def _file_stem(number, name):
+    return f"{number:06d}_{_UNSAFE_NAME_RE.sub('_', str(name)).strip('_')[:60] or 'case'}"
+
+
+def _render_chunk(chunk, kinds):
+    """[(arcname, bytes), ...] for a chunk of (number, record) pairs; runs in a worker."""
+    files = []
+    for number, record in chunk:
+        stem = _file_stem(number, record['custom_name'])
+        if "pdf" in kinds:
+            files.append((f"{stem}.pdf", reports.create_pdf_report(
+                record['inputs'], record['full_result'], record['custom_name'],
+                record.get('financial_commentary') or "Analysis not available.")))
+        if "png" in kinds:
+            files.append((f"{stem}.png", reports.create_summary_image(
+                record['inputs'], record['full_result'], record['custom_name'])))
+    return files
+
+
+def _init_worker():
+    # Build the summary-image template once per worker instead of on its first record
+    reports._summary_template()
+
+
+def _chunks(records, chunk_size):
+    chunk = []
+    for number, record in enumerate(records, 1):
+        chunk.append((number, record))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_reports(records, zip_path, kinds=KINDS, workers=None, chunk_size=16, show_progress=True):
+    """Render every record's reports into `zip_path`. Returns counts, bytes and throughput.
+
+    `records` is any iterable of dicts shaped like the app's history records
+    (inputs, full_result, custom_name, financial_commentary); it is consumed lazily.
+    """
+    unknown = [kind for kind in kinds if kind not in KINDS]
+    if unknown:
+        raise ValueError(f"unknown report kind(s) {unknown}; choose from {KINDS}")
+    workers = workers or os.cpu_count() or 1
+    part_path = zip_path + ".part"
+    stats = {"records": 0, "files": 0, "bytes": 0}
+    # Only one ZIP entry can be open for writing at a time, so the index waits in a temp file
+    index = tempfile.TemporaryFile("w+", encoding="utf-8", newline="")
+    index_writer = csv.writer(index)
+    index_writer.writerow(["number", "name", "final_risk", "decision", "files"])
+    started = time.perf_counter()
+
+    # PNG and compressed PDF streams barely deflate: store them and skip the CPU cost
+    with zipfile.ZipFile(part_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        def commit(chunk, files):
+            for arcname, data in files:
+                archive.writestr(arcname, data)
+                stats["bytes"] += len(data)
+            stats["files"] += len(files)
+            for number, record in chunk:
+                final_risk = record['full_result']['Final_Risk']
+                index_writer.writerow([number, record['custom_name'], final_risk, risk_engine.decision_for(final_risk),
+                                       " ".join(f"{_file_stem(number, record['custom_name'])}.{kind}" for kind in kinds)])
+            stats["records"] += len(chunk)
+            if show_progress:
+                elapsed = max(time.perf_counter() - started, 1e-9)
+                print(f"\r{stats['records']:,} records, {stats['files']:,} files ({stats['records'] / elapsed:,.1f} "
+                      f"records/s, {stats['bytes'] / elapsed / 1e6:,.1f} MB/s)", end="", file=sys.stderr)
+
+        chunks = _chunks(records, chunk_size)
+        if workers <= 1:
+            _init_worker()
+            for chunk in chunks:
+                commit(chunk, _render_chunk(chunk, kinds))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+                # Bounded window of in-flight chunks keeps memory flat and the ZIP in input order
+                pending = collections.deque()
+                for chunk in chunks:
+                    pending.append((chunk, pool.submit(_render_chunk, chunk, kinds)))
+                    if len(pending) >= workers * 2:
+                        chunk, future = pending.popleft()
+                        commit(chunk, future.result())
+                while pending:
+                    chunk, future = pending.popleft()
+                    commit(chunk, future.result())
+        index.seek(0)
+        with archive.open("index.csv", "w") as entry, index:
+            shutil.copyfileobj(index.buffer, entry)
+
+    os.replace(part_path, zip_path)
+    elapsed = time.perf_counter() - started
+    if show_progress:
+        print(file=sys.stderr)
+    stats.update(seconds=round(elapsed, 3), records_per_s=round(stats["records"] / max(elapsed, 1e-9), 2),
+                 mb_per_s=round(stats["bytes"] / max(elapsed, 1e-9) / 1e6, 2), zip_bytes=os.path.getsize(zip_path))
+    return stats
+
+
+def record_from_scored(row, number):
+    """A history-shaped record from one row of `python -m risk_engine score` output."""
+    inputs = {key: row[column] for column, key in _INPUT_COLUMNS.items() if column in row}
+    story = row.get("user_story")
+    inputs["user_story"] = story if isinstance(story, str) else ""
+    analysis = row.get("Text_Analysis")
+    result = {"Math_Score": row["Math_Score"], "Text_Score": row["Text_Score"], "Final_Risk": row["Final_Risk"],
+              "Text_Analysis": json.loads(analysis) if isinstance(analysis, str) else analysis or {}}
+    contributions = {column[:-len("_contribution")]: row[column] for column in row if column.endswith("_contribution")}
+    if contributions:
+        # --explain output: the forest's average score is what the contributions start from
+        result["Math_Contributions"] = {"base": round(row["Math_Score"] - sum(contributions.values()), 2),
+                                        "contributions": contributions}
+    name = row.get("name")
+    return {"inputs": inputs, "full_result": result,
+            "custom_name": name if isinstance(name, str) and name else f"Case #{number}",
+            "financial_commentary": reports.generate_financial_insight(row["Math_Score"],
+                                                                       result.get("Math_Contributions"))}
+
+
+def records_from_scored(path, chunk_size=10_000):
+    from bulk_score import iter_chunks
+    number = 0
+    for chunk in iter_chunks(path, chunk_size):
+        for row in chunk.to_dict("records"):
+            number += 1
+            yield record_from_scored(row, number)
+
+
+def records_from_history(path):
+    from history_store import HistoryStore
+    yield from HistoryStore(path).iter_records()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python bulk_export.py", description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="ZIP file to write")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--history", help="the app's history database (history.sqlite)")
+    source.add_argument("--scored", help="CSV or JSONL written by `python -m risk_engine score`")
+    parser.add_argument("--kinds", default="pdf,png", help="comma-separated: pdf, png (default: both)")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=16, help="records per task (default: 16)")
+    args = parser.parse_args(argv)
+
+    if args.history and not os.path.exists(args.history):
+        print(f"❌ No history database at {args.history}")
+        return 1
+    records = records_from_history(args.history) if args.history else records_from_scored(args.scored)
+    try:
+        stats = export_reports(records, args.output, kinds=tuple(args.kinds.split(",")), workers=args.workers,
+                               chunk_size=args.chunk_size)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Exported {stats['records']:,} records ({stats['files']:,} files, {stats['zip_bytes'] / 1e6:,.1f} MB) "
+          f"to {args.output} in {stats['seconds']:.1f}s: {stats['records_per_s']:,.1f} records/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
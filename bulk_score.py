@@ -0,0 +1,208 @@
+"""Streaming bulk scorer behind `python -m risk_engine score in.csv out.csv`.
+
+The input (CSV or JSONL) is read in fixed-size chunks, chunks are scored in a
+process pool (each worker unpickles the Random Forest once), and results are
+appended to the output in input order. After every chunk is written and
+fsync'd, a small `<out>.progress` checkpoint records how many rows and bytes are
+committed, so a crashed run picks up from the last committed chunk. Before
+resuming, the committed part of the output is re-counted. A missing, short or
+mismatched output is refused instead of silently losing those rows.
+With --explain, each row also gets the forest's per-feature TreeSHAP
+contributions (`<feature>_contribution` columns, in points).
+"""
+import collections
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+import time
+
+import joblib
+import pandas as pd
+
+import risk_engine
+
+
+def _is_jsonl(path):
+    return path.lower().endswith((".jsonl", ".ndjson"))
+
+
+def iter_chunks(path, chunk_size, skip_rows=0):
+    """Yield DataFrames of up to chunk_size rows, never holding the whole file."""
+    if _is_jsonl(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for _ in range(skip_rows):
+                if not f.readline():
+                    return
+            yield from pd.read_json(f, lines=True, chunksize=chunk_size)
+    else:
+        skip = range(1, skip_rows + 1) if skip_rows else None
+        yield from pd.read_csv(path, chunksize=chunk_size, skiprows=skip)
+
+
+# Set per worker process by _init_worker
+_explain = False
+# risk_engine globals _init_worker may change; put back after an in-process run
+_WORKER_GLOBALS = ("rf_model", "model", "explainer", "_flat_forest", "_rf_model_replaced",
+                   "EARLY_EXIT", "GEMINI_BATCH", "GEMINI_RPM")
+
+
+def _init_worker(model_path, offline, early_exit=False, gemini_batch=False, workers=1, explain=False):
+    # Runs once per worker process: load the forest here, not per chunk
+    global _explain
+    if risk_engine.INFERENCE_BACKEND == "flat" and model_path == risk_engine.RF_MODEL_PATH:
+        # Every worker maps the same exported artifact (shared pages, no unpickle)
+        risk_engine.get_flat_forest()
+    else:
+        risk_engine.set_rf_model(joblib.load(model_path))
+    if offline:
+        risk_engine.model = None
+    if early_exit:
+        risk_engine.EARLY_EXIT = True
+    if gemini_batch:
+        risk_engine.GEMINI_BATCH = True
+    if risk_engine.GEMINI_RPM > 0:
+        # Workers are separate processes: split the bulk share of the quota between them
+        risk_engine.GEMINI_RPM = risk_engine.GEMINI_RPM * risk_engine.GEMINI_BULK_SHARE / workers
+    if explain:
+        _explain = True
+        risk_engine.get_explainer()
+
+
+def _score_chunk(chunk):
+    scored = risk_engine.get_total_risk_batch(chunk)
+    if _explain:
+        return pd.concat([chunk, scored, risk_engine.explain_math_scores(chunk)], axis=1)
+    return pd.concat([chunk, scored], axis=1)
+
+
+def _encode_chunk(scored, jsonl, header):
+    if jsonl:
+        text = scored.to_json(orient="records", lines=True, double_precision=15)
+        if not text.endswith("\n"):
+            text += "\n"
+    else:
+        scored = scored.assign(Text_Analysis=scored["Text_Analysis"].map(json.dumps))
+        text = scored.to_csv(header=header, index=False, lineterminator="\n")
+    return text.encode("utf-8")
+
+
+def _load_checkpoint(progress_path):
+    try:
+        with open(progress_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(progress_path, state):
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    tmp_path = progress_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, progress_path)
+
+
+def _committed_rows(out_path, n_bytes, jsonl):
+    """Records in the first n_bytes of out_path, or None if the file is missing or shorter."""
+    if n_bytes == 0:
+        return 0
+    if not os.path.exists(out_path) or os.path.getsize(out_path) < n_bytes:
+        return None
+
+    def lines(f):
+        remaining = n_bytes
+        for line in f:
+            if remaining <= 0:
+                return
+            line = line[:remaining]
+            remaining -= len(line)
+            yield line.decode("utf-8")
+
+    with open(out_path, "rb") as f:
+        if jsonl:
+            return sum(1 for line in lines(f) if line.strip())
+        # csv.reader, not a line count: quoted stories may contain newlines
+        return max(0, sum(1 for _ in csv.reader(lines(f))) - 1)
+
+
+def score_file(in_path, out_path, chunk_size=10_000, workers=None, model_path="baseline_model_rf.pkl",
+               offline=False, early_exit=False, resume=True, show_progress=True, gemini_batch=False, explain=False):
+    """Score in_path into out_path chunk by chunk. Returns the number of rows in out_path."""
+    global _explain
+    progress_path = out_path + ".progress"
+    workers = workers or os.cpu_count() or 1
+    jsonl_out = _is_jsonl(out_path)
+
+    state = _load_checkpoint(progress_path) if resume else None
+    if state and state["input"] != os.path.abspath(in_path):
+        raise ValueError(f"{progress_path} belongs to a run over {state['input']}; pass --no-resume to start over")
+    if state is None:
+        state = {"input": os.path.abspath(in_path), "rows": 0, "bytes": 0}
+    else:
+        # Resuming skips the committed rows, so they must really be in the output
+        found = _committed_rows(out_path, state["bytes"], jsonl_out)
+        if found != state["rows"]:
+            what = "is missing or truncated" if found is None else f"holds {found:,} rows"
+            raise ValueError(f"{out_path} {what} but {progress_path} says {state['rows']:,} rows are committed; "
+                             f"pass --no-resume to start over")
+        if show_progress:
+            print(f"Resuming after {state['rows']:,} committed rows", file=sys.stderr)
+
+    started = time.perf_counter()
+    resumed_rows = state["rows"]
+
+    with open(out_path, "ab" if state["bytes"] else "wb") as out:
+        # Drop anything written after the last committed chunk
+        out.truncate(state["bytes"])
+
+        def commit(scored):
+            out.write(_encode_chunk(scored, jsonl_out, header=state["bytes"] == 0))
+            out.flush()
+            os.fsync(out.fileno())
+            state["rows"] += len(scored)
+            state["bytes"] = out.tell()
+            _save_checkpoint(progress_path, state)
+            if show_progress:
+                done = state["rows"] - resumed_rows
+                rate = done / max(time.perf_counter() - started, 1e-9)
+                print(f"\r{state['rows']:,} rows scored ({rate:,.0f} rows/s)", end="", file=sys.stderr)
+
+        chunks = iter_chunks(in_path, chunk_size, skip_rows=state["rows"])
+        if workers <= 1:
+            # No pool: the worker setup runs in this process, so undo it afterwards
+            saved = {name: vars(risk_engine).get(name, risk_engine._UNSET) for name in _WORKER_GLOBALS}
+            saved_explain = _explain
+            try:
+                _init_worker(model_path, offline, early_exit, gemini_batch, explain=explain)
+                for chunk in chunks:
+                    commit(_score_chunk(chunk))
+            finally:
+                for name, value in saved.items():
+                    if value is risk_engine._UNSET:
+                        vars(risk_engine).pop(name, None)
+                    else:
+                        setattr(risk_engine, name, value)
+                _explain = saved_explain
+        else:
+            with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                        initargs=(model_path, offline, early_exit, gemini_batch,
+                                                                  workers, explain)) as pool:
+                # Bounded window of in-flight chunks keeps memory flat and output ordered
+                pending = collections.deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_score_chunk, chunk))
+                    if len(pending) >= workers * 2:
+                        commit(pending.popleft().result())
+                while pending:
+                    commit(pending.popleft().result())
+
+    if show_progress:
+        print(file=sys.stderr)
+    # Finished cleanly: nothing left to resume
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    return state["rows"]
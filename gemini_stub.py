@@ -0,0 +1,124 @@
+"""Local stand-in for the Gemini endpoint, for offline tests and benchmarks.
+
+    import risk_engine, gemini_stub
+    risk_engine.model = gemini_stub.StubGenerativeModel(latency_s=0.2, error_rate=0.1)
+
+The stub answers with the same JSON structure the real prompt asks for, scored
+by the keyword fallback so results are deterministic per story. Batched prompts
+(several stories per request) get a JSON array back. Latency, the share of
+failing calls (raised as StubAPIError with an HTTP-style `.code`) and the
+share of batch entries that come back missing or malformed are configurable.
+With quota_rpm the stub also enforces a requests-per-minute quota the way the
+real endpoint does, answering 429 once the bucket is empty.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+
+_STORY_RE = re.compile(r'Applicant Story: "(.*?)"\n', re.DOTALL)
+_BATCH_RE = re.compile(r'Applicant Stories: (.*)\n')
+
+
+class StubAPIError(Exception):
+    def __init__(self, code, message=None):
+        super().__init__(message or f"stub error {code}")
+        self.code = code
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubGenerativeModel:
+    model_name = "models/gemini-stub"
+
+    def __init__(self, latency_s=0.05, jitter_s=0.0, error_rate=0.0, error_codes=(429, 503), seed=None,
+                 per_story_s=0.0, drop_rate=0.0, quota_rpm=None, quota_burst=None):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.per_story_s = per_story_s
+        self.drop_rate = drop_rate
+        self.quota_per_s = quota_rpm / 60 if quota_rpm else None
+        self.quota_burst = quota_burst or max(1.0, (quota_rpm or 0) / 60)
+        self._quota_tokens = self.quota_burst
+        self._quota_refilled = time.monotonic()
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _plan(self, prompt):
+        # Decide latency and outcome up front so sync and async paths behave alike
+        batch = _BATCH_RE.search(prompt)
+        n_stories = len(json.loads(batch.group(1))) if batch else 1
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_s + self.per_story_s * n_stories + self._rng.uniform(0, self.jitter_s)
+            error = None
+            if self.quota_per_s is not None:
+                now = time.monotonic()
+                self._quota_tokens = min(self.quota_burst,
+                                         self._quota_tokens + (now - self._quota_refilled) * self.quota_per_s)
+                self._quota_refilled = now
+                if self._quota_tokens < 1:
+                    self.rate_limited += 1
+                    return 0.0, StubAPIError(429, "quota exceeded")
+                self._quota_tokens -= 1
+            if self._rng.random() < self.error_rate:
+                self.errors += 1
+                error = StubAPIError(self._rng.choice(self.error_codes))
+        return delay, error
+
+    @staticmethod
+    def _analysis(story):
+        import risk_engine
+        score, analysis = risk_engine._fallback_text_risk(story)
+        return {
+            "purpose_legitimacy": score,
+            "financial_responsibility": score,
+            "urgency_desperation": min(100, analysis["high_risk_matches"] * 25),
+            "clarity": min(100, analysis["clarity_penalty"] * 4),
+            "red_flags": min(100, analysis["high_risk_matches"] * 30),
+            "overall_risk": score,
+            "confidence": 80,
+            "explanation": "Stubbed analysis derived from keyword matches.",
+        }
+
+    def _respond(self, prompt):
+        batch = _BATCH_RE.search(prompt)
+        if batch is None:
+            match = _STORY_RE.search(prompt)
+            return StubResponse(json.dumps(self._analysis(match.group(1) if match else prompt)))
+
+        entries = []
+        for item in json.loads(batch.group(1)):
+            entry = {"id": item["id"], **self._analysis(item["story"])}
+            with self._lock:
+                dropped = self._rng.random() < self.drop_rate
+                malformed = dropped and self._rng.random() < 0.5
+            if malformed:
+                entries.append(dict(entry, overall_risk="high"))
+            elif not dropped:
+                entries.append(entry)
+        return StubResponse(json.dumps(entries))
+
+    def generate_content(self, prompt, **kwargs):
+        delay, error = self._plan(prompt)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return self._respond(prompt)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        delay, error = self._plan(prompt)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return self._respond(prompt)
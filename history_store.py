@@ -0,0 +1,149 @@
+"""Persistent assessment history for the Streamlit app, in SQLite.
+
+Each assessment is one row, tagged with an `owner`. The app passes the id
+kept in its URL (?history=...), so browser sessions sharing one
+history.sqlite each list, open and rename only their own cases, and a
+reload or bookmark of that URL gets them back. Bulk export (iter_records)
+reads every owner. Rows written before owners existed belong to owner "".
+
+The columns the sidebar needs (id, name, risk label) are kept apart from the
+inputs and result, which are stored as compact JSON and only read when a
+case is opened. Pages are read newest first, keyed on the id ("WHERE id <
+last seen"), so a page costs the same however long the history is. Every
+index starts with the owner. Name search is a case-insensitive prefix match
+on an indexed NOCASE column (the index carries the label too, so matches are
+listed without touching the table), and the risk-label filter has its own
+(owner, risk_label, id) index. Neither scans the table. A prefix matching so
+many cases that sorting them would cost more than walking ids newest first
+until a page is full (more than sqrt(page size x cases), counted through the
+index with that cap) is served by the id walk instead.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+# Per-request diagnostics that the app never shows again
+_DROPPED_RESULT_KEYS = ("Timings",)
+
+
+def _compact(value):
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+class HistoryStore:
+    def __init__(self, path="history.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS assessments (
+                                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                created_at REAL NOT NULL,
+                                name TEXT COLLATE NOCASE,
+                                risk_label TEXT NOT NULL,
+                                final_risk REAL NOT NULL,
+                                inputs TEXT NOT NULL,
+                                result TEXT NOT NULL,
+                                financial_commentary TEXT,
+                                owner TEXT NOT NULL DEFAULT '')""")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(assessments)")]
+        if "owner" not in columns:
+            # A history from before owners: its rows stay visible to owner ""
+            self._db.execute("ALTER TABLE assessments ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+        self._db.execute("DROP INDEX IF EXISTS idx_assessments_name")
+        self._db.execute("DROP INDEX IF EXISTS idx_assessments_label")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_assessments_owner ON assessments (owner, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_assessments_owner_name ON assessments (owner, name, risk_label)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_assessments_owner_label ON assessments (owner, risk_label, id)")
+
+    def add(self, inputs, result, risk_label, financial_commentary=None, name=None, owner=""):
+        """Store an assessment for `owner` and return its id. Without a name it is called "Case #<id>"."""
+        result = {k: v for k, v in result.items() if k not in _DROPPED_RESULT_KEYS}
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                cursor = self._db.execute(
+                    """INSERT INTO assessments (created_at, name, risk_label, final_risk, inputs, result,
+                                                financial_commentary, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (time.time(), name, risk_label, float(result["Final_Risk"]), _compact(inputs), _compact(result),
+                     financial_commentary, owner))
+                record_id = cursor.lastrowid
+                if name is None:
+                    self._db.execute("UPDATE assessments SET name = ? WHERE id = ?", (f"Case #{record_id}", record_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return record_id
+
+    @staticmethod
+    def _record(row):
+        return {"id": row[0], "custom_name": row[1], "risk_label": row[2], "inputs": json.loads(row[3]),
+                "full_result": json.loads(row[4]), "financial_commentary": row[5]}
+
+    def get(self, record_id, owner=""):
+        """The full record (the app's old session_state.history entry shape), or None if `owner` has no such case."""
+        with self._lock:
+            row = self._db.execute("""SELECT id, name, risk_label, inputs, result, financial_commentary
+                                      FROM assessments WHERE id = ? AND owner = ?""", (record_id, owner)).fetchone()
+        return None if row is None else self._record(row)
+
+    def iter_records(self, batch_size=500):
+        """Every owner's full records, oldest first, read `batch_size` rows at a time (for bulk export)."""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute("""SELECT id, name, risk_label, inputs, result, financial_commentary
+                                           FROM assessments WHERE id > ? ORDER BY id LIMIT ?""",
+                                        (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._record(row)
+            last_id = rows[-1][0]
+
+    def rename(self, record_id, name, owner=""):
+        with self._lock:
+            self._db.execute("UPDATE assessments SET name = ? WHERE id = ? AND owner = ?", (name, record_id, owner))
+
+    def page(self, limit=20, before_id=None, name_prefix="", risk_label=None, owner=""):
+        """Newest-first (id, name, risk_label) rows of `owner`, older than `before_id` when given.
+
+        `name_prefix` matches the start of the case name, ignoring ASCII case.
+        """
+        clauses, params = ["owner = ?"], [owner]
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if risk_label:
+            clauses.append("risk_label = ?")
+            params.append(risk_label)
+        with self._lock:
+            if name_prefix:
+                # A range on the NOCASE index; U+10FFFF sorts after any character a name can continue with
+                name_range = (name_prefix, name_prefix + "\U0010ffff")
+                # Sorting m matches costs ~m rows; the id walk reads ~limit * n / m rows to fill a page
+                max_id = self._db.execute("SELECT MAX(id) FROM assessments WHERE owner = ?", (owner,)).fetchone()[0] or 0
+                cap = max(limit, int((limit * max_id) ** 0.5))
+                broad = self._db.execute(
+                    """SELECT COUNT(*) FROM (SELECT 1 FROM assessments
+                                             WHERE owner = ? AND name >= ? AND name < ? LIMIT ?)""",
+                    (owner, *name_range, cap)).fetchone()[0] >= cap
+                # A rare prefix: collect its few matches through the name index, then sort them.
+                # A common one ("case"): walk ids newest first, with the name index switched off.
+                clauses.append("+name >= ? AND +name < ?" if broad else "name >= ? AND name < ?")
+                params += name_range
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            return self._db.execute(f"SELECT id, name, risk_label FROM assessments {where} ORDER BY id DESC LIMIT ?",
+                                    (*params, limit)).fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM assessments").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM assessments")
@@ -0,0 +1,90 @@
+"""Keyword tables for the fallback text scorer, compiled once at import.
+
+A story is lowercased and split into words in one pass (punctuation becomes a
+separator, apostrophes are dropped), single-word keywords and their simple
+plurals are found with one set intersection, and the handful of multi-word
+phrases are only checked when their first word is present. Matching is on
+whole words: 'bet' no longer fires inside 'better' nor 'fine' inside
+'refinance'. That correctness fix is the point; it is barely faster than the
+old substring loop (see benchmarks/bench_keywords.py).
+"""
+import string
+
+HIGH_RISK_KEYWORDS = [
+    'gambling', 'casino', 'lottery', 'bet', 'poker',
+    'debt', 'owe', 'collection', 'bankruptcy', 'foreclosure',
+    'desperate', 'urgent', 'emergency', 'asap', 'immediately',
+    'legal trouble', 'lawsuit', 'court', 'fine', 'penalty',
+    'loan shark', 'payday', 'cash advance'
+]
+
+MEDIUM_RISK_KEYWORDS = [
+    'bills', 'overdue', 'late payment', 'catch up',
+    'unexpected', 'surprise', 'didn\'t plan',
+    'personal reasons', 'rather not say', 'private'
+]
+
+LOW_RISK_KEYWORDS = [
+    'business', 'expansion', 'investment', 'equipment',
+    'education', 'training', 'certification', 'degree',
+    'home improvement', 'renovation', 'repair',
+    'medical', 'healthcare', 'treatment',
+    'consolidation', 'refinance', 'lower interest',
+    'startup', 'entrepreneur', 'venture', 'project'
+]
+
+TIERS = ("high", "medium", "low")
+
+KEYWORD_TIER = {}
+for _tier, _words in zip(TIERS, (HIGH_RISK_KEYWORDS, MEDIUM_RISK_KEYWORDS, LOW_RISK_KEYWORDS)):
+    for _word in _words:
+        KEYWORD_TIER[_word] = _tier
+
+
+# Punctuation splits words; apostrophes (straight or curly) vanish so "didn't" == "didn’t" == "didnt"
+_WORD_TABLE = str.maketrans(
+    {c: " " for c in string.punctuation if c != "'"} | {"'": None, "’": None}
+)
+_PLURAL_SUFFIXES = ("", "s", "es")
+
+
+def _words(text):
+    return text.lower().translate(_WORD_TABLE).split()
+
+
+# Every accepted surface form of a single-word keyword -> keyword ("debts" -> "debt")
+WORD_FORMS = {}
+# Multi-word keywords: phrase -> (its first word, space-padded surface forms)
+PHRASES = {}
+for _keyword in KEYWORD_TIER:
+    _parts = _words(_keyword)
+    if len(_parts) == 1:
+        for _suffix in _PLURAL_SUFFIXES:
+            WORD_FORMS.setdefault(_parts[0] + _suffix, _keyword)
+    else:
+        PHRASES[_keyword] = (_parts[0], tuple(f" {' '.join(_parts)}{_suffix} " for _suffix in _PLURAL_SUFFIXES))
+_WORD_FORM_SET = frozenset(WORD_FORMS)
+_PHRASE_FIRST_WORDS = frozenset(first_word for first_word, _ in PHRASES.values())
+
+
+def _found_keywords(words):
+    tokens = set(words)
+    found = {WORD_FORMS[t] for t in tokens & _WORD_FORM_SET}
+    padded = None
+    for phrase, (first_word, forms) in PHRASES.items():
+        if first_word not in tokens:
+            continue
+        if padded is None:
+            padded = f" {' '.join(words)} "
+        if any(form in padded for form in forms):
+            found.add(phrase)
+    return found
+
+
+def count_keywords(user_story):
+    """(high, medium, low) counts of distinct keywords found in one story."""
+    counts = {tier: 0 for tier in TIERS}
+    for keyword in _found_keywords(_words(user_story)):
+        counts[KEYWORD_TIER[keyword]] += 1
+    return counts["high"], counts["medium"], counts["low"]
+
@@ -0,0 +1,77 @@
+"""Async wrapper around a Gemini GenerativeModel for the text half of the engine.
+
+Every call is bounded three ways:
+- a semaphore caps how many requests are in flight at once,
+- a deadline caps the whole call (queueing + retries) in wall-clock time,
+- 429/5xx responses are retried with exponential backoff and full jitter,
+- with a llm_scheduler.RateLimitScheduler, every attempt first takes a token
+  from the shared quota at the caller's priority.
+
+When the deadline expires asyncio.TimeoutError is raised so the caller can fall
+back to the keyword scorer instead of stalling.
+"""
+import asyncio
+import random
+import weakref
+
+from llm_scheduler import BULK, INTERACTIVE
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def is_retryable(exc):
+    # google.api_core exceptions (ResourceExhausted, ServiceUnavailable, ...) carry the HTTP status as `.code`
+    code = getattr(exc, "code", None)
+    if code is None:
+        code = getattr(exc, "status_code", None)
+    return code in RETRYABLE_STATUS
+
+
+class AsyncGeminiClient:
+    def __init__(self, model, max_concurrency=8, deadline_s=15.0, max_retries=3, base_delay_s=0.5, max_delay_s=8.0,
+                 scheduler=None):
+        self.model = model
+        self.scheduler = scheduler
+        self.max_concurrency = max_concurrency
+        self.deadline_s = deadline_s
+        self.max_retries = max_retries
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        # asyncio primitives belong to one event loop; keep a semaphore per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def backoff_delay(self, attempt):
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * (2 ** attempt)))
+
+    async def _generate_with_retries(self, prompt, priority, has_token=False, **kwargs):
+        attempt = 0
+        while True:
+            if self.scheduler is not None and not has_token:
+                await self.scheduler.acquire_async(priority)
+            has_token = False
+            try:
+                async with self._semaphore():
+                    return await self.model.generate_content_async(prompt, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+            # Back off outside the semaphore so waiting retries don't hold a slot
+            await asyncio.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    async def generate(self, prompt, deadline_s=None, priority=INTERACTIVE, **kwargs):
+        """generate_content_async with bounded concurrency, retries, a deadline and the shared quota."""
+        deadline_s = self.deadline_s if deadline_s is None else deadline_s
+        has_token = False
+        if self.scheduler is not None and priority == BULK:
+            # Bulk work may queue for quota as long as it takes; its deadline covers the call itself
+            has_token = await self.scheduler.acquire_async(BULK)
+        return await asyncio.wait_for(self._generate_with_retries(prompt, priority, has_token, **kwargs), deadline_s)
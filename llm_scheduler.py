@@ -0,0 +1,236 @@
+"""Shared Gemini quota: a token bucket with an interactive-first priority queue.
+
+Every Gemini request (each retry included) takes one token. Tokens refill at
+the configured requests-per-minute up to `burst`. Waiters queue by priority.
+INTERACTIVE (an underwriter clicking "Predict Risk", POST /score) always
+gets the next token before BULK (re-scoring files, batched prompts), and
+`interactive_reserve` tokens are held back from bulk work so a click never
+queues behind a burst of bulk calls.
+
+Bulk producers get backpressure two ways. acquire(BULK) blocks while
+`max_bulk_waiting` bulk requests are already queued. bulk_backpressure() is
+a cheap check a producer can poll before it submits more work.
+
+One scheduler serves sync callers (threads) and async callers (any event
+loop) in the same process. stats() reports queue depth per priority and
+wait times.
+"""
+import asyncio
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+class _Ticket:
+    __slots__ = ("priority", "enqueued", "granted", "event", "loop", "future")
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.event = None
+        self.loop = None
+        self.future = None
+
+    def wake(self):
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimitScheduler:
+    def __init__(self, requests_per_minute, burst=None, interactive_reserve=1, max_bulk_waiting=64,
+                 wait_samples=1024):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self.rate_per_s = requests_per_minute / 60
+        self.burst = max(1, burst if burst is not None else max(1, int(requests_per_minute / 60)))
+        self.interactive_reserve = min(interactive_reserve, self.burst - 1) if self.burst > 1 else 0
+        self.max_bulk_waiting = max_bulk_waiting
+        self._lock = threading.Lock()
+        self._bulk_admission = threading.Condition(self._lock)
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._queue = []
+        self._seq = itertools.count()
+        self._depth = {INTERACTIVE: 0, BULK: 0}
+        self._granted = {INTERACTIVE: 0, BULK: 0}
+        self._timeouts = {INTERACTIVE: 0, BULK: 0}
+        self._waits = {INTERACTIVE: collections.deque(maxlen=wait_samples),
+                       BULK: collections.deque(maxlen=wait_samples)}
+
+    # --- bucket and dispatch (always under self._lock) ---
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_per_s)
+        self._refilled = now
+
+    def _available_for(self, priority):
+        # Bulk work may not dip into the tokens held back for interactive requests
+        floor = self.interactive_reserve if priority == BULK else 0
+        return self._tokens - floor >= 1
+
+    def _dispatch(self):
+        """Grant tokens to queued tickets in priority order; returns seconds until the next token."""
+        now = time.monotonic()
+        self._refill(now)
+        while self._queue:
+            _, _, ticket = self._queue[0]
+            if ticket.granted:
+                heapq.heappop(self._queue)
+                continue
+            if not self._available_for(ticket.priority):
+                break
+            heapq.heappop(self._queue)
+            self._grant(ticket, now)
+            ticket.wake()
+        if not self._queue:
+            return None
+        priority = self._queue[0][2].priority
+        floor = self.interactive_reserve if priority == BULK else 0
+        return max(0.001, (floor + 1 - self._tokens) / self.rate_per_s)
+
+    def _grant(self, ticket, now):
+        ticket.granted = True
+        self._tokens -= 1
+        self._depth[ticket.priority] -= 1
+        self._granted[ticket.priority] += 1
+        self._waits[ticket.priority].append(now - ticket.enqueued)
+        if ticket.priority == BULK:
+            self._bulk_admission.notify()
+
+    def _enqueue(self, ticket):
+        self._depth[ticket.priority] += 1
+        heapq.heappush(self._queue, (ticket.priority, next(self._seq), ticket))
+
+    def _abandon(self, ticket):
+        # Timed out or cancelled: give the token back if it was granted in the meantime
+        if ticket.granted:
+            self._tokens = min(self.burst, self._tokens + 1)
+            self._granted[ticket.priority] -= 1
+        else:
+            ticket.granted = True  # lazily dropped from the heap by _dispatch
+            self._depth[ticket.priority] -= 1
+            if ticket.priority == BULK:
+                self._bulk_admission.notify()
+        self._timeouts[ticket.priority] += 1
+
+    def _admit_bulk(self, deadline):
+        # Backpressure: hold bulk producers while enough bulk work is already queued
+        while self._depth[BULK] >= self.max_bulk_waiting:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._bulk_admission.wait(remaining)
+        return True
+
+    def _next_wait(self, next_token, deadline):
+        if deadline is None:
+            return next_token
+        remaining = max(0.0, deadline - time.monotonic())
+        return remaining if next_token is None else min(next_token, remaining)
+
+    def _recheck(self, ticket, deadline):
+        """After a wake-up: (granted, next_token). Gives up the ticket once the deadline has passed."""
+        with self._lock:
+            if not ticket.granted:
+                next_token = self._dispatch()
+                if not ticket.granted:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        self._abandon(ticket)
+                        return False, None
+                    return None, next_token
+        return True, None
+
+    # --- public API ---
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """Block until a token is granted. Returns False if `timeout` seconds pass first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = _Ticket(priority)
+        ticket.event = threading.Event()
+        with self._lock:
+            if priority == BULK and not self._admit_bulk(deadline):
+                self._timeouts[BULK] += 1
+                return False
+            self._enqueue(ticket)
+            next_token = self._dispatch()
+        while True:
+            if not ticket.granted:
+                ticket.event.wait(self._next_wait(next_token, deadline))
+            granted, next_token = self._recheck(ticket, deadline)
+            if granted is not None:
+                return granted
+
+    async def acquire_async(self, priority=INTERACTIVE, timeout=None):
+        """acquire() for coroutines: waits without blocking the event loop."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = _Ticket(priority)
+        ticket.loop = asyncio.get_running_loop()
+        ticket.future = ticket.loop.create_future()
+        while True:
+            with self._lock:
+                if priority != BULK or self._depth[BULK] < self.max_bulk_waiting:
+                    self._enqueue(ticket)
+                    next_token = self._dispatch()
+                    break
+            # Backpressure without parking a thread: poll until the bulk queue has room
+            if deadline is not None and time.monotonic() >= deadline:
+                with self._lock:
+                    self._timeouts[BULK] += 1
+                return False
+            await asyncio.sleep(self._next_wait(1 / self.rate_per_s, deadline))
+        try:
+            while True:
+                if not ticket.granted:
+                    try:
+                        await asyncio.wait_for(asyncio.shield(ticket.future), self._next_wait(next_token, deadline))
+                    except asyncio.TimeoutError:
+                        pass
+                granted, next_token = self._recheck(ticket, deadline)
+                if granted is not None:
+                    return granted
+        except asyncio.CancelledError:
+            with self._lock:
+                self._abandon(ticket)
+            raise
+
+    def bulk_backpressure(self):
+        """True when bulk producers should slow down: interactive work is waiting or the bulk queue is full."""
+        with self._lock:
+            return self._depth[INTERACTIVE] > 0 or self._depth[BULK] >= self.max_bulk_waiting
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            out = {"requests_per_minute": self.rate_per_s * 60, "burst": self.burst,
+                   "tokens": round(self._tokens, 2)}
+            for priority, name in PRIORITY_NAMES.items():
+                waits = sorted(self._waits[priority])
+                out[name] = {
+                    "queue_depth": self._depth[priority],
+                    "granted": self._granted[priority],
+                    "timeouts": self._timeouts[priority],
+                    "wait_p50_ms": round(_percentile(waits, 0.50) * 1000, 1),
+                    "wait_p95_ms": round(_percentile(waits, 0.95) * 1000, 1),
+                    "wait_max_ms": round((waits[-1] if waits else 0.0) * 1000, 1),
+                }
+            return out
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
@@ -0,0 +1,263 @@
+"""Per-stage timers and a process-wide metrics registry with Prometheus text export.
+
+    with metrics.stage("math.predict"):
+        scores = forest.predict_proba(frame)
+
+`stage` adds its elapsed time to the breakdown of the request being scored
+(`collect_stages`). get_total_risk returns that breakdown under
+Timings["stages"]. When RISK_METRICS=1, `stage` also records the time in the
+`risk_stage_seconds` histogram. Counters track scored requests, where each
+text score came from (Gemini, fallback, ...) and Gemini errors by type.
+`render()` writes everything in Prometheus text format; the API serves it
+at GET /metrics.
+
+With RISK_METRICS unset, every recording call returns after one flag check.
+Outside a request, `stage` costs two perf_counter calls.
+"""
+import bisect
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+ENABLED = os.getenv("RISK_METRICS", "0") == "1"
+
+# Seconds; scoring stages range from tens of microseconds (keywords) to seconds (Gemini)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+
+def _label_text(labelnames, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        return [f"{self.name}{_label_text(self.labelnames, key)} {value}" for key, value in sorted(self.values().items())]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def summary(self):
+        """{labels: {"count", "sum_s", "mean_ms"}} for each recorded series."""
+        with self._lock:
+            return {key: {"count": sum(counts), "sum_s": round(total, 6),
+                          "mean_ms": round(total / sum(counts) * 1000, 3)}
+                    for key, (counts, total) in self._series.items()}
+
+    def render(self):
+        lines = []
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        """All metrics in Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("risk_stage_seconds", "Time spent in each scoring stage.", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram("risk_request_seconds", "End-to-end get_total_risk latency.", ("mode",))
+REQUESTS = REGISTRY.counter("risk_requests_total", "Applicants scored.", ("mode",))
+TEXT_SOURCES = REGISTRY.counter("risk_text_source_total",
+                                "Where each text score came from: gemini (including exact story-cache hits), "
+                                "near_duplicate, fallback, short_circuit or local_model.", ("source",))
+LLM_ERRORS = REGISTRY.counter("risk_llm_errors_total", "Failed Gemini calls by error type.", ("type",))
+
+_stages = contextvars.ContextVar("risk_stages", default=None)
+# A request's dict is shared with the threads and tasks it starts, so updates and reads take this lock
+_stages_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def collect_stages():
+    """Collect stage times (ms) for one request into the yielded dict.
+
+    Threads and tasks started with a copy of this context (contextvars.copy_context,
+    asyncio tasks, asyncio.to_thread) add to the same dict.
+    """
+    stages = {}
+    token = _stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _stages.reset(token)
+
+
+class stage:
+    """Context manager timing one stage of the current request."""
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        stages = _stages.get()
+        if stages is not None:
+            with _stages_lock:
+                stages[self.name] = stages.get(self.name, 0.0) + elapsed * 1000
+        if ENABLED:
+            STAGE_SECONDS.observe(elapsed, stage=self.name)
+        return False
+
+
+def rounded(stages):
+    # A stage thread that outlived its request (e.g. past the text deadline) may still be adding to it
+    with _stages_lock:
+        return {name: round(ms, 3) for name, ms in stages.items()}
+
+
+def text_source(text_analysis):
+    """Where a text score came from, read off the markers its analysis carries."""
+    if text_analysis.get("short_circuit"):
+        return "short_circuit"
+    if text_analysis.get("fallback"):
+        return "fallback"
+    if text_analysis.get("local_model"):
+        return "local_model"
+    if "near_duplicate" in text_analysis:
+        return "near_duplicate"
+    return "gemini"
+
+
+def llm_error_type(error):
+    """Short label for a failed Gemini call: timeout, http_<code>, parse or the exception class."""
+    import asyncio
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    code = getattr(error, "code", None)
+    if isinstance(code, int) or (isinstance(code, str) and code.isdigit()):
+        return f"http_{code}"
+    if isinstance(error, (ValueError, KeyError)):
+        return "parse"
+    return type(error).__name__
+
+
+def record_request(mode, seconds, text_analysis=None):
+    if not ENABLED:
+        return
+    REQUESTS.inc(mode=mode)
+    REQUEST_SECONDS.observe(seconds, mode=mode)
+    if text_analysis is not None:
+        TEXT_SOURCES.inc(source=text_source(text_analysis))
+
+
+def record_llm_error(error):
+    if ENABLED:
+        LLM_ERRORS.inc(type=llm_error_type(error))
+
+
+def snapshot():
+    """Metrics as plain JSON-friendly dicts, with the fallback rate worked out."""
+    sources = {key[0]: value for key, value in TEXT_SOURCES.values().items()}
+    scored = sum(sources.values())
+    return {
+        "enabled": ENABLED,
+        "requests": {key[0]: value for key, value in REQUESTS.values().items()},
+        "text_sources": sources,
+        "fallback_rate": round(sources.get("fallback", 0) / scored, 4) if scored else 0.0,
+        "llm_errors": {key[0]: value for key, value in LLM_ERRORS.values().items()},
+        "stages": {key[0]: value for key, value in STAGE_SECONDS.summary().items()},
+    }
+
+
+def render():
+    return REGISTRY.render()
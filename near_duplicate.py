@@ -0,0 +1,202 @@
+"""Near-duplicate index for analysed stories: MinHash signatures with LSH banding.
+
+Stories that differ only in names, amounts or punctuation get the same
+Gemini analysis, so they should not each cost a call. Each story becomes a
+set of word shingles. Digits are folded to "0", capitalised words inside a
+sentence (names, places) to one placeholder, and punctuation is dropped
+first. The shingle set is summarised by a MinHash signature, and the fraction
+of equal signature slots estimates the Jaccard similarity of two stories.
+The signature is cut into bands and every band is hashed into an LSH bucket.
+A lookup only compares the few stored stories that share a bucket with the
+new one, whatever the index size.
+
+The buckets and signatures live in SQLite (the story cache's file by
+default), so memory stays flat however many stories are stored. The index
+keeps the newest `max_items` stories. It only maps a story to the
+story-cache key of its analysis; the analysis itself stays in StoryCache.
+`namespace` (prompt version + model) is hashed into every bucket, so
+analyses from another prompt are never offered.
+"""
+import hashlib
+import re
+import sqlite3
+import string
+import threading
+import time
+import zlib
+
+import numpy as np
+
+_MERSENNE_31 = (1 << 31) - 1
+_DIGITS_RE = re.compile(r"\d+")
+# A capitalised word that does not start a sentence is almost always a name or place
+_PROPER_NOUN_RE = re.compile(r"(?<=[^.!?\s]) +[A-Z][a-z]+\b")
+_PUNCTUATION_TABLE = str.maketrans({c: " " for c in string.punctuation})
+
+
+def story_words(user_story):
+    """Words of a story with names, digits, case and punctuation folded away."""
+    masked = _PROPER_NOUN_RE.sub(" xnamex", _DIGITS_RE.sub("0", user_story))
+    return masked.casefold().translate(_PUNCTUATION_TABLE).split()
+
+
+def story_shingles(user_story, size=2):
+    """Distinct word n-grams of a story, after folding case, digits and punctuation."""
+    words = story_words(user_story) if isinstance(user_story, str) else user_story
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class NearDuplicateIndex:
+    def __init__(self, path="story_cache.sqlite", threshold=0.8, num_perm=64, bands=16, shingle_size=2,
+                 min_words=6, max_items=1_000_000, max_candidates=32, preview_chars=160, trim_every=1000,
+                 seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.max_items = max_items
+        self.max_candidates = max_candidates
+        self.preview_chars = preview_chars
+        self.trim_every = trim_every
+        self.lookups = 0
+        self.matches = 0
+        self.evictions = 0
+        self._puts_since_trim = 0
+        # One universal hash (a * x + b) mod p per signature slot
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_31, size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS near_dup_stories (
+                                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                key TEXT NOT NULL,
+                                namespace TEXT NOT NULL,
+                                signature BLOB NOT NULL,
+                                preview TEXT NOT NULL,
+                                created_at REAL NOT NULL,
+                                UNIQUE (namespace, key))""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS near_dup_bands (
+                                bucket INTEGER NOT NULL,
+                                story_id INTEGER NOT NULL,
+                                PRIMARY KEY (bucket, story_id)) WITHOUT ROWID""")
+
+    def signature(self, user_story):
+        """MinHash signature (uint32[num_perm]) of a story, or None if it is too short to compare."""
+        words = story_words(user_story)
+        if len(words) < self.min_words:
+            return None
+        shingles = story_shingles(words, self.shingle_size)
+        ids = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        hashed = (ids[:, None] * self._a + self._b) % _MERSENNE_31
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def _buckets(self, signature, namespace):
+        salt = hashlib.blake2b(namespace.encode("utf-8"), digest_size=16).digest()
+        buckets = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(chunk, digest_size=7, salt=salt).digest()
+            # Band number in the top byte keeps buckets of different bands apart; fits a signed 64-bit column
+            buckets.append((band << 56) | int.from_bytes(digest, "big"))
+        return buckets
+
+    def find(self, user_story, namespace=""):
+        """Best stored match at or above the threshold as {key, similarity, preview}, else None."""
+        signature = self.signature(user_story)
+        if signature is None:
+            return None
+        buckets = self._buckets(signature, namespace)
+        with self._lock:
+            self.lookups += 1
+            # Two primary-key probes: bucket -> story ids, then id -> stored signature
+            ids = [row[0] for row in self._db.execute(
+                f"SELECT DISTINCT story_id FROM near_dup_bands WHERE bucket IN ({','.join('?' * len(buckets))}) LIMIT ?",
+                (*buckets, self.max_candidates))]
+            rows = self._db.execute(
+                f"SELECT key, signature, preview FROM near_dup_stories WHERE id IN ({','.join('?' * len(ids))}) "
+                # Unary + keeps SQLite on the primary key instead of scanning the namespace index
+                "AND +namespace = ?", (*ids, namespace)).fetchall() if ids else []
+        if not rows:
+            return None
+        stored = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.uint32).reshape(len(rows), -1)
+        similarity = (stored == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        if similarity[best] < self.threshold:
+            return None
+        with self._lock:
+            self.matches += 1
+        return {"key": rows[best][0], "similarity": round(float(similarity[best]), 3), "preview": rows[best][2]}
+
+    def add(self, key, user_story, namespace=""):
+        """Index a story whose analysis is stored under `key`. Returns False if it is too short."""
+        signature = self.signature(user_story)
+        if signature is None:
+            return False
+        preview = " ".join(user_story.split())[:self.preview_chars]
+        buckets = self._buckets(signature, namespace)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                cursor = self._db.execute(
+                    """INSERT OR IGNORE INTO near_dup_stories (key, namespace, signature, preview, created_at)
+                       VALUES (?, ?, ?, ?, ?)""", (key, namespace, signature.tobytes(), preview, time.time()))
+                if cursor.rowcount:
+                    self._db.executemany("INSERT OR IGNORE INTO near_dup_bands (bucket, story_id) VALUES (?, ?)",
+                                         [(bucket, cursor.lastrowid) for bucket in buckets])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= self.trim_every:
+                self._trim()
+        return True
+
+    def _trim(self):
+        # Oldest stories beyond max_items go, bucket rows first (found again from their signatures)
+        self._puts_since_trim = 0
+        count = self._db.execute("SELECT COUNT(*) FROM near_dup_stories").fetchone()[0]
+        excess = count - self.max_items
+        if excess <= 0:
+            return
+        oldest = self._db.execute("SELECT id, namespace, signature FROM near_dup_stories ORDER BY id LIMIT ?",
+                                  (excess,)).fetchall()
+        self._db.execute("BEGIN")
+        self._db.executemany("DELETE FROM near_dup_bands WHERE bucket = ? AND story_id = ?",
+                             [(bucket, story_id) for story_id, namespace, signature in oldest
+                              for bucket in self._buckets(np.frombuffer(signature, dtype=np.uint32), namespace)])
+        self._db.execute("DELETE FROM near_dup_stories WHERE id <= ?", (oldest[-1][0],))
+        self._db.execute("COMMIT")
+        self.evictions += len(oldest)
+
+    def trim(self):
+        with self._lock:
+            self._trim()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM near_dup_stories").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM near_dup_bands")
+            self._db.execute("DELETE FROM near_dup_stories")
+
+    def stats(self):
+        return {
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "match_rate": round(self.matches / self.lookups, 4) if self.lookups else 0.0,
+            "evictions": self.evictions,
+        }
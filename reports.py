@@ -0,0 +1,368 @@
+"""Report renderers for scored applications.
+
+create_pdf_report writes the PDF report and create_summary_image draws the
+one-page PNG summary. The PDF's Financial Metrics section lists the forest's
+per-feature contributions (result["Math_Contributions"], from
+risk_engine.explain_math_score_row) when the result carries them. Fonts are loaded once
+per (file, size), and everything that does not depend on the applicant
+(background, cards, headings, labels and empty bars) is drawn once
+into a template canvas. Each render copies the template and only draws the
+case's text, scores and bar fills on top.
+"""
+import datetime
+import functools
+import io
+import os
+import textwrap
+
+from fpdf import FPDF
+from PIL import Image, ImageDraw, ImageFont
+
+_FONT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ---------------------------------------------------------
+# SUMMARY IMAGE
+# ---------------------------------------------------------
+W, H = 800, 650  # Slightly taller to accommodate data comfortably
+bg_color = "#f4f6f9"
+card_color = "#ffffff"
+text_header_color = "#95a5a6"  # Light gray headers
+text_main_color = "#2c3e50"    # Dark blue/gray main text
+bar_bg_color = "#eceff1"
+
+# Grid coordinates for cleaner code
+col1_x, col2_x = 30, 410
+row1_y, row2_y = 100, 360
+card_w = 360
+row1_h, row2_h = 230, 240
+line_height = 35
+
+# Main progress bar (top-left card) and the mini bars of the risk-indicator card
+bar_x, bar_y = col1_x + 20 + 200, row1_y + 20 + 155
+bar_w, bar_h = 110, 10
+mini_bar_x = col2_x + card_w - 110
+mini_bar_w, mini_bar_h = 80, 8
+
+SNAPSHOT_LABELS = ("Monthly Income ", "Loan Requested ", "DTI Ratio ", "Credit History ")
+INDICATOR_LABELS = ("Purpose Legitimacy", "Financial Responsibility", "Urgency/Desperation", "Clarity of Plan")
+INDICATOR_KEYS = ("purpose_legitimacy", "financial_responsibility", "urgency_desperation", "clarity")
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(name, size):
+    """TrueType font from the repo folder, loaded once per (file, size)."""
+    try:
+        # Use the bundled fonts (guaranteed to work on Streamlit Cloud)
+        return ImageFont.truetype(os.path.join(_FONT_DIR, name), size)
+    except OSError:
+        # Fallback only if the files are physically missing from the folder
+        print(f"Error: Font file {name} not found. Using default.")
+        return ImageFont.load_default()
+
+
+def _fonts():
+    return {
+        "title": get_font("Roboto-Bold.ttf", 28),
+        "header_big": get_font("Roboto-Bold.ttf", 18),
+        "header_small": get_font("Roboto-Regular.ttf", 14),
+        "text": get_font("Roboto-Regular.ttf", 13),
+        "text_bold": get_font("Roboto-Bold.ttf", 13),
+        "score_big": get_font("Roboto-Bold.ttf", 48),
+        "score_small": get_font("Roboto-Bold.ttf", 16),
+    }
+
+
+@functools.lru_cache(maxsize=1)
+def _summary_template():
+    """The static layout, drawn once. Callers must copy() it before drawing."""
+    f = _fonts()
+    img = Image.new('RGB', (W, H), color=bg_color)
+    d = ImageDraw.Draw(img)
+
+    # Header title and confidence badge
+    d.text((30, 35), "DeepCheck Credit Risk Assessment", fill=text_main_color, font=f["title"])
+    d.rounded_rectangle([(W - 200, 35), (W - 30, 70)], radius=10, fill=bar_bg_color)
+
+    # Top left card: decision and main score
+    d.rounded_rectangle([(col1_x, row1_y), (col1_x + card_w, row1_y + row1_h)], radius=12, fill=card_color)
+    card_x, card_y = col1_x + 20, row1_y + 20
+    d.text((card_x, card_y), "RECOMMENDATION", fill=text_header_color, font=f["header_small"])
+    d.text((card_x, card_y + 100), "OVERALL RISK SCORE", fill=text_header_color, font=f["header_small"])
+    d.rectangle([(bar_x, bar_y), (bar_x + bar_w, bar_y + bar_h)], fill=bar_bg_color, outline=None)
+
+    # Top right card: applicant snapshot
+    d.rounded_rectangle([(col2_x, row1_y), (col2_x + card_w, row1_y + row1_h)], radius=12, fill=card_color)
+    card_x, card_y = col2_x + 20, row1_y + 20
+    d.text((card_x, card_y), "APPLICANT SNAPSHOT", fill=text_header_color, font=f["header_small"])
+    for i, label_txt in enumerate(SNAPSHOT_LABELS):
+        d.text((card_x, card_y + 50 + i * line_height), label_txt, fill="#546e7a", font=f["text"])
+
+    # Bottom left card: AI narrative
+    d.rounded_rectangle([(col1_x, row2_y), (col1_x + card_w, row2_y + row2_h)], radius=12, fill=card_color)
+    d.text((col1_x + 20, row2_y + 20), "AI NARRATIVE SUMMARY", fill=text_header_color, font=f["header_small"])
+
+    # Bottom right card: detailed risk indicators
+    d.rounded_rectangle([(col2_x, row2_y), (col2_x + card_w, row2_y + row2_h)], radius=12, fill=card_color)
+    card_x, card_y = col2_x + 20, row2_y + 20
+    d.text((card_x, card_y), "DETAILED RISK INDICATORS", fill=text_header_color, font=f["header_small"])
+    for i, label_txt in enumerate(INDICATOR_LABELS):
+        curr_y = card_y + 50 + i * line_height
+        d.text((card_x, curr_y), label_txt, fill="#546e7a", font=f["text"])
+        d.rectangle([(mini_bar_x, curr_y + 5), (mini_bar_x + mini_bar_w, curr_y + 5 + mini_bar_h)], fill=bar_bg_color)
+    return img
+
+
+def create_summary_image(data, result, label):
+    f = _fonts()
+    img = _summary_template().copy()
+    d = ImageDraw.Draw(img)
+
+    # --- DYNAMIC THEME BASED ON RISK ---
+    score = result.get('Final_Risk', 0)
+    if score > 60:
+        theme_color = "#d32f2f"  # Red
+        decision = "REJECT (High Risk)"
+        status_bg = "#ffebee"
+    elif score > 40:
+        theme_color = "#f57c00"  # Orange
+        decision = "MANUAL REVIEW (Medium Risk)"
+        status_bg = "#fff3e0"
+    else:
+        theme_color = "#388e3c"  # Green
+        decision = "APPROVE (Low Risk)"
+        status_bg = "#e8f5e9"
+
+    # --- MAIN HEADER SECTION (Top Strip) ---
+    d.rectangle([(0, 0), (W, 15)], fill=theme_color)
+    d.text((30, 70), f"Case ID: {label} | Date: {datetime.date.today().strftime('%d-%m-%Y')}",
+           fill=text_header_color, font=f["header_small"])
+
+    # Confidence Badge
+    conf = result.get('Text_Analysis', {}).get('confidence', 'N/A')
+    conf_text = f"AI Confidence: {conf}%"
+    conf_w = d.textlength(conf_text, font=f["text_bold"])
+    d.text((W - 115 - conf_w / 2, 45), conf_text, fill="#546e7a", font=f["text_bold"])
+
+    # --- TOP LEFT CARD: DECISION & MAIN SCORE ---
+    card_x, card_y = col1_x + 20, row1_y + 20
+    status_w = d.textlength(decision, font=f["header_big"])
+    pill_rect = [(card_x, card_y + 30), (card_x + status_w + 40, card_y + 70)]
+    d.rounded_rectangle(pill_rect, radius=8, fill=status_bg)
+    d.text((card_x + 20, card_y + 40), decision, fill=theme_color, font=f["header_big"])
+    d.text((card_x, card_y + 125), f"{score}/100", fill=text_main_color, font=f["score_big"])
+    fill_w = int(bar_w * (score / 100))
+    d.rectangle([(bar_x, bar_y), (bar_x + fill_w, bar_y + bar_h)], fill=theme_color, outline=None)
+
+    # --- TOP RIGHT CARD: APPLICANT SNAPSHOT ---
+    snapshot_values = [
+        f"${data.get('income', 0):,}",
+        f"${data.get('loan_amount', 0):,}",
+        f"{data.get('dti', 0):.2f}",
+        f"{data.get('credit_history', 'N/A')} Yrs",
+    ]
+    curr_y = card_y + 50
+    for val_txt in snapshot_values:
+        val_w = d.textlength(val_txt, font=f["header_big"])
+        d.text((col2_x + card_w - 30 - val_w, curr_y - 3), val_txt, fill=text_main_color, font=f["header_big"])
+        curr_y += line_height
+
+    # --- BOTTOM LEFT CARD: AI NARRATIVE ---
+    exp = result.get('Text_Analysis', {}).get('explanation', 'No analysis provided.')
+    # Wrap width depends on font size, approx 40 chars for this width
+    text_y = row2_y + 20 + 53
+    for line in textwrap.wrap(exp, width=50)[:10]:
+        d.text((col1_x + 20, text_y), line, fill=text_main_color, font=f["text"])
+        text_y += 20
+
+    # --- BOTTOM RIGHT CARD: DETAILED RISK INDICATORS ---
+    analysis = result.get('Text_Analysis', {})
+    curr_y = row2_y + 20 + 50
+    for key in INDICATOR_KEYS:
+        val_score = analysis.get(key, 0)
+        val_txt = f"{val_score}/100"
+        val_w = d.textlength(val_txt, font=f["score_small"])
+        d.text((col2_x + card_w - 120 - val_w, curr_y), val_txt, fill=text_main_color, font=f["score_small"])
+
+        # Ensure val_score is an int for calculation
+        try:
+            score_int = int(val_score)
+        except (TypeError, ValueError):
+            score_int = 0
+        mini_fill_w = int(mini_bar_w * (score_int / 100))
+        # Use theme color for bar, or gray if 0/unknown
+        bar_color = theme_color if score_int > 0 else "#cfd8dc"
+        mini_bar_y = curr_y + 5
+        d.rectangle([(mini_bar_x, mini_bar_y), (mini_bar_x + mini_fill_w, mini_bar_y + mini_bar_h)], fill=bar_color)
+        curr_y += line_height
+
+    # --- FOOTER ---
+    # Drawn last, not in the template: a ten-line narrative runs down into it
+    footer_y = H - 30
+    d.line([(30, footer_y), (W - 30, footer_y)], fill="#e0e0e0", width=1)
+    footer_note = "DeepCheck Credit Risk Report | Generated via Cloudflare-Is-Not-Available AI"
+    d.text((30, footer_y + 10), footer_note, fill="#b0bec5", font=f["text"])
+
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+# ---------------------------------------------------------
+# PDF REPORT
+# ---------------------------------------------------------
+def clean_text(text):
+    """Sanitize text to remove unsupported characters for PDF."""
+    if not isinstance(text, str):
+        return str(text)
+    # Replace smart quotes and dashes with standard ASCII
+    replacements = {
+        '\u2018': "'", '\u2019': "'", # Smart single quotes
+        '\u201c': '"', '\u201d': '"', # Smart double quotes
+        '\u2013': '-', '\u2014': '-', # Dashes
+        '\u2026': '...',              # Ellipsis
+        '–': '-'
+    }
+    for k, v in replacements.items():
+        text = text.replace(k, v)
+    
+    # Force Latin-1 compatible, replacing unknowns with '?'
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+# Model feature -> display name for the math-score contributions
+FEATURE_LABELS = {
+    "age": "Age", "monthly_income": "Monthly Income", "loan_amount": "Loan Amount", "loan_term": "Loan Term",
+    "dti": "DTI Ratio", "credit_history": "Credit History", "num_dependents": "Dependents",
+}
+
+def math_drivers(math_contributions, top=None):
+    """(display name, points) pairs, largest effect first."""
+    drivers = sorted(math_contributions['contributions'].items(), key=lambda item: abs(item[1]), reverse=True)
+    return [(FEATURE_LABELS.get(name, name), points) for name, points in drivers[:top]]
+
+def generate_financial_insight(math_score, math_contributions=None):
+    # Drivers are the forest's own TreeSHAP contributions, not fixed rules
+    summary = "Math model predicts HIGH risk." if math_score > 70 else "Math model predicts LOW risk."
+    if not math_contributions:
+        return summary
+    drivers = [f"{name} {'raises' if points > 0 else 'lowers'} it by {abs(points):.1f} pts"
+               for name, points in math_drivers(math_contributions, top=3) if abs(points) >= 0.05]
+    return f"{summary} Main drivers: {'; '.join(drivers)}." if drivers else summary
+
+def create_pdf_report(data, result, label, fin_text):
+    pdf = FPDF()
+    pdf.add_page()
+    
+    # HEADER
+    pdf.set_font("Arial", 'B', 20)
+    pdf.cell(0, 10, "Credit Risk Assessment Report", ln=True, align='L')
+    pdf.set_font("Arial", 'I', 10)
+    pdf.cell(0, 10, f"Generated via Cloudflare-Is-Not-Available AI | Date: {datetime.date.today().strftime('%d-%m-%Y')}", ln=True, align='L')
+    pdf.ln(5)
+
+    # 1. APPLICANT DATA
+    pdf.set_font("Arial", 'B', 14)
+    pdf.set_fill_color(240, 240, 240)
+    pdf.cell(0, 10, "  1. Applicant Data", ln=True, fill=True)
+    pdf.ln(5)
+    pdf.set_font("Arial", '', 10)
+    
+    labels = {
+        "income": "Monthly Income", "loan_amount": "Loan Amount", "dti": "Debt-to-Income Ratio",
+        "age": "Applicant Age", "dependents": "Number of Dependents", "loan_term": "Loan Term (Months)",
+        "credit_history": "Credit History (Years)", "user_story": "Loan Purpose"
+    }
+    
+    for key, value in data.items():
+        label_text = labels.get(key, key.title())
+        
+        # --- Clean the value before printing ---
+        safe_value = clean_text(value) 
+        
+        pdf.cell(60, 7, f"{label_text}", border=0)
+        if key == "user_story":
+            pdf.multi_cell(0, 7, f": {safe_value}", border=0)
+        else:
+            pdf.cell(0, 7, f": {safe_value}", border=0, ln=True)
+    pdf.ln(10)
+
+    # 2. DETAILED ANALYSIS
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 10, "  2. Detailed Risk Analysis", ln=True, fill=True)
+    pdf.ln(5)
+
+    # A. Financial
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 8, f"A. Financial Metrics (Math Model: {result['Math_Score']}/100)", ln=True)
+    pdf.set_font("Arial", '', 10)
+    
+    # --- FIX APPLIED HERE: Clean fin_text ---
+    pdf.multi_cell(0, 6, clean_text(fin_text))
+
+    # Contributions Table (two per row, largest first)
+    math_contributions = result.get('Math_Contributions')
+    if math_contributions:
+        pdf.ln(2)
+        pdf.set_font("Arial", 'I', 10)
+        drivers = math_drivers(math_contributions)
+        for i, (name, points) in enumerate(drivers):
+            pdf.cell(95, 8, f"- {name}: {points:+.1f} pts", border=1, ln=i % 2 == 1 or i == len(drivers) - 1)
+        pdf.set_font("Arial", '', 9)
+        pdf.cell(0, 6, f"Average applicant: {math_contributions['base']}/100. Positive points raise the risk.", ln=True)
+    pdf.ln(5)
+
+    # B. Behavioral
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(0, 8, f"B. Behavioral/Story Analysis (LLM Model: {result['Text_Score']}/100)", ln=True)
+    pdf.set_font("Arial", '', 10)
+    
+    explanation = result.get('Text_Analysis', {}).get('explanation', 'N/A')
+    
+    # --- FIX APPLIED HERE: Use clean_text instead of manual replace ---
+    # Your previous code was: safe_explanation = explanation.encode('latin-1', 'replace').decode('latin-1')
+    # clean_text does that PLUS the smart quote fix.
+    pdf.multi_cell(0, 6, clean_text(explanation))
+    pdf.ln(5)
+    
+    # Flags Table
+    analysis = result.get('Text_Analysis', {})
+    pdf.set_font("Arial", 'I', 10)
+    pdf.cell(95, 8, f"- Purpose Legitimacy: {analysis.get('purpose_legitimacy', '-')}/100", border=1)
+    pdf.cell(95, 8, f"- Financial Responsibility: {analysis.get('financial_responsibility', '-')}/100", border=1, ln=True)
+    pdf.cell(95, 8, f"- Urgency/Desperation: {analysis.get('urgency_desperation', '-')}/100", border=1)
+    pdf.cell(95, 8, f"- Clarity of Plan: {analysis.get('clarity', '-')}/100", border=1, ln=True)
+    pdf.ln(10)
+
+    # 3. EXECUTIVE SUMMARY (ALIGNED COLONS)
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 10, "  3. Executive Summary", ln=True, fill=True)
+    pdf.ln(5)
+    
+    final_score = result['Final_Risk']
+    if final_score > 60: 
+        decision = "REJECT"; color_text = "(High Risk)"
+        r, g, b = 200, 0, 0 # RED
+    elif final_score > 40: 
+        decision = "MANUAL REVIEW"; color_text = "(Medium Risk)"
+        r, g, b = 220, 120, 0 # ORANGE
+    else: 
+        decision = "APPROVE"; color_text = "(Low Risk)"
+        r, g, b = 0, 150, 0 # GREEN
+    
+    # Row 1: Recommendation (Red Text)
+    pdf.set_font("Arial", 'B', 12)
+    pdf.cell(50, 8, "Recommendation", border=0) # Fixed width label
+    pdf.set_text_color(r, g, b)
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 8, f": {decision} {color_text}", ln=True)
+    
+    # Row 2: Final Score (Black Text)
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font("Arial", '', 11)
+    pdf.cell(50, 8, "Final Risk Score", border=0)
+    pdf.cell(0, 8, f": {final_score}/100", ln=True)
+    
+    # Row 3: Confidence
+    pdf.cell(50, 8, "AI Confidence", border=0)
+    pdf.cell(0, 8, f": {result.get('Text_Analysis', {}).get('confidence', 'N/A')}%", ln=True)
+
+    return pdf.output(dest="S").encode("latin-1")
@@ -1,63 +1,421 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import logging
+import threading
+import time
 import pandas as pd
-import joblib
+import numpy as np
 import os
-import google.generativeai as genai
-
-# 1. Load your teammate's "Math Brain"
-try:
-    rf_model = joblib.load("baseline_model_rf.pkl")
-    print("✅ Teammate's model loaded!")
-except Exception as e:
-    print(f"❌ Model not found: {e}")
-    print("Please run train_model.py first to generate the model.")
-    rf_model = None
-
-# Initialize Gemini client with API key
-# Initialize Gemini client with API key
-from dotenv import load_dotenv
-load_dotenv()
-
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
+
+from llm_client import AsyncGeminiClient
+from llm_scheduler import BULK, INTERACTIVE, RateLimitScheduler
+from keyword_scorer import count_keywords
+import metrics
+from story_cache import StoryCache, cache_key
+
+# Features in the exact order the teammate trained the Random Forest on
+FEATURE_COLUMNS = ["age", "monthly_income", "loan_amount", "loan_term", "dti", "credit_history", "num_dependents"]
+
+# Fusion weights: Math model 70%, Text model 30%
+MATH_WEIGHT = 0.7
+TEXT_WEIGHT = 0.3
+
+# Decision cut-offs on Final_Risk (same as app.py): > 60 REJECT, > 40 MANUAL REVIEW, else APPROVE
+REVIEW_THRESHOLD = 40
+REJECT_THRESHOLD = 60
+
+# Early exit: skip the text stage when the math score alone fixes the decision
+EARLY_EXIT = os.getenv("RISK_EARLY_EXIT", "0") == "1"
+
+logger = logging.getLogger(__name__)
+# One line per get_total_risk with its per-stage timings (see metrics.py)
+timing_logger = logging.getLogger(__name__ + ".timings")
+
+# The forest, Gemini client and .env are all loaded on first use (or by warmup()),
+# so importing this module stays cheap for Streamlit cold starts, tests and forked workers.
+# `rf_model` and `model` stay assignable module attributes, e.g. for gemini_stub; use
+# set_rf_model() to swap the forest so the flat arrays and TreeSHAP tables follow it.
+RF_MODEL_PATH = os.getenv("RISK_RF_MODEL_PATH", "baseline_model_rf.pkl")
+_load_lock = threading.RLock()
+_UNSET = object()
+
+# Math-model inference: "sklearn" (predict_proba) or "flat" (tree_eval.FlatForest, same outputs).
+# The flat backend memory-maps RF_ARTIFACT_PATH when it exists (`python -m tree_eval export`),
+# so workers share one read-only copy and never unpickle the forest.
+INFERENCE_BACKEND = os.getenv("RISK_INFERENCE_BACKEND", "sklearn")
+RF_ARTIFACT_PATH = os.getenv("RISK_RF_ARTIFACT_PATH", "baseline_model_rf.flat")
+_flat_forest = None
+# True once set_rf_model() replaced the forest: flatten that model, not the artifact
+_rf_model_replaced = False
+
+# Cascade: score with the Logistic Regression first and only run the forest when the LR score
+# is within CASCADE_BAND points of a decision cut-off (REVIEW_THRESHOLD / REJECT_THRESHOLD)
+CASCADE = os.getenv("RISK_CASCADE", "0") == "1"
+CASCADE_BAND = float(os.getenv("RISK_CASCADE_BAND", "10"))
+LR_MODEL_PATH = os.getenv("RISK_LR_MODEL_PATH", "baseline_model_lr.pkl")
+_cascade_lock = threading.Lock()
+_cascade_counts = {"rows": 0, "forest_rows": 0}
+
+# Limits for each Gemini call: in-flight requests, wall-clock deadline (seconds) and retries on 429/5xx
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_DEADLINE_S = float(os.getenv("GEMINI_DEADLINE_S", "15"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+_async_client = None
+
+# Shared Gemini quota (see llm_scheduler): GEMINI_RPM requests/minute for this process, 0 = unlimited.
+# Interactive calls (get_total_risk, POST /score) always go before bulk ones (batches, bulk files).
+# Bulk-score workers split GEMINI_BULK_SHARE of the quota between them.
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "0"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "0")) or None
+GEMINI_BULK_MAX_WAITING = int(os.getenv("GEMINI_BULK_MAX_WAITING", "64"))
+GEMINI_BULK_SHARE = float(os.getenv("GEMINI_BULK_SHARE", "0.8"))
+_llm_scheduler = None
+
+# Bulk text analysis can pack several stories into one Gemini request (RISK_GEMINI_BATCH=1).
+# Batches close at GEMINI_BATCH_MAX_STORIES stories or GEMINI_BATCH_MAX_CHARS characters of story text.
+GEMINI_BATCH = os.getenv("RISK_GEMINI_BATCH", "0") == "1"
+GEMINI_BATCH_MAX_STORIES = int(os.getenv("GEMINI_BATCH_MAX_STORIES", "20"))
+GEMINI_BATCH_MAX_CHARS = int(os.getenv("GEMINI_BATCH_MAX_CHARS", "8000"))
+GEMINI_BATCH_DEADLINE_S = float(os.getenv("GEMINI_BATCH_DEADLINE_S", "60"))
+_BATCH_ENTRY_OVERHEAD = 32  # JSON id/story wrapping per story
+_story_batch_lock = threading.Lock()
+_story_batch_counts = {"requests": 0, "stories": 0, "requeued": 0}
+
+# Threads used to run the text stage next to the math stage inside get_total_risk
+STAGE_POOL_WORKERS = int(os.getenv("RISK_STAGE_POOL_WORKERS", "8"))
+_stage_pool = None
+
+# Gemini model and prompt revision; both are part of the story-cache key.
+# Bump PROMPT_VERSION whenever _build_prompt changes.
+GEMINI_MODEL_NAME = 'gemini-2.0-flash'
+PROMPT_VERSION = "v1"
+
+# Story-analysis cache: in-process LRU backed by SQLite (set STORY_CACHE_PATH="" for memory only)
+STORY_CACHE_ENABLED = os.getenv("STORY_CACHE_ENABLED", "1") != "0"
+STORY_CACHE_PATH = os.getenv("STORY_CACHE_PATH", "story_cache.sqlite")
+STORY_CACHE_TTL_S = float(os.getenv("STORY_CACHE_TTL_S", str(30 * 24 * 3600)))
+STORY_CACHE_MAX_ITEMS = int(os.getenv("STORY_CACHE_MAX_ITEMS", "200000"))
+_story_cache = None
+
+# Near-duplicate reuse (RISK_NEAR_DUP=1): a story whose MinHash similarity to an analysed one is at
+# least NEAR_DUP_THRESHOLD reuses that analysis, flagged under Text_Analysis["near_duplicate"]
+NEAR_DUP_ENABLED = os.getenv("RISK_NEAR_DUP", "0") == "1"
+NEAR_DUP_THRESHOLD = float(os.getenv("RISK_NEAR_DUP_THRESHOLD", "0.8"))
+_near_duplicates = None
+
+# Text backend: "gemini" (keyword fallback without an API key) or "local", the in-process model
+# distilled from stored Gemini analyses (`python text_model.py train`); keywords if it is missing
+TEXT_BACKEND = os.getenv("RISK_TEXT_BACKEND", "gemini")
+TEXT_MODEL_PATH = os.getenv("RISK_TEXT_MODEL_PATH", "text_model.joblib")
+
+
+def _load_rf_model():
+    # 1. Load your teammate's "Math Brain"
+    import joblib
+    try:
+        loaded = joblib.load(RF_MODEL_PATH)
+        logger.info("✅ Teammate's model loaded!")
+        return loaded
+    except Exception as e:
+        logger.error("❌ Model not found: %s. Please run train_model.py first to generate the model.", e)
+        return None
+
+
+def _load_lr_model():
+    import joblib
+    try:
+        loaded = joblib.load(LR_MODEL_PATH)
+        logger.info("✅ Logistic Regression loaded for cascade mode")
+        return loaded
+    except Exception as e:
+        logger.error("❌ Logistic Regression not found: %s", e)
+        return None
+
+
+def _load_text_model():
+    from text_model import LocalTextModel
+    try:
+        loaded = LocalTextModel.load(TEXT_MODEL_PATH)
+        logger.info("✅ Local text model loaded (%s stories)", loaded.report.get("stories", "?"))
+        return loaded
+    except Exception as e:
+        logger.error("❌ Local text model not found: %s. Run `python text_model.py train` first.", e)
+        return None
+
+
+def _load_explainer():
+    from tree_shap import ForestExplainer
+    rf = get_rf_model()
+    if rf is None:
+        return None
+    explainer = ForestExplainer.from_sklearn(rf)
+    logger.info("✅ TreeSHAP tables built (%s leaves)", explainer.n_leaves)
+    return explainer
+
+
+def _load_gemini_model():
+    # Initialize Gemini client with API key
+    from dotenv import load_dotenv
+    load_dotenv()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        logger.warning("⚠️ No API key found. Text analysis will use fallback scoring.")
+        return None
+    import google.generativeai as genai
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    print("✅ Gemini client initialized with API key")
-else:
-    model = None
-    print("⚠️ No API key found. Text analysis will use fallback scoring.")
-
-def get_total_risk(age, income, loan_amount, loan_term, dti, credit_history, dependents, user_story):
-    
-    # --- PART 1: THE MATH BRAIN (Teammate's Code) ---
-    math_risk_score = 0
-    if rf_model is None:
+    logger.info("✅ Gemini client initialized with API key")
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+
+def _lazy(name, loader):
+    value = globals().get(name, _UNSET)
+    if value is _UNSET:
+        with _load_lock:
+            value = globals().get(name, _UNSET)
+            if value is _UNSET:
+                value = loader()
+                globals()[name] = value
+    return value
+
+
+def get_rf_model():
+    """The Random Forest, unpickled on first call (None if the pickle is missing)."""
+    return _lazy("rf_model", _load_rf_model)
+
+
+def get_lr_model():
+    """The Logistic Regression used by cascade mode, unpickled on first call (None if missing)."""
+    return _lazy("lr_model", _load_lr_model)
+
+
+def get_text_model():
+    """The local text model used when RISK_TEXT_BACKEND=local, loaded on first call (None if missing)."""
+    return _lazy("text_model", _load_text_model)
+
+
+def get_explainer():
+    """TreeSHAP tables for the Random Forest (tree_shap.py), built on first call (None if the pickle is missing)."""
+    return _lazy("explainer", _load_explainer)
+
+
+def get_gemini_model():
+    """The Gemini GenerativeModel, configured on first call (None without GEMINI_API_KEY)."""
+    return _lazy("model", _load_gemini_model)
+
+
+def __getattr__(name):
+    # `risk_engine.rf_model` / `risk_engine.model` keep working and trigger the lazy load
+    if name == "rf_model":
+        return get_rf_model()
+    if name == "model":
+        return get_gemini_model()
+    if name == "lr_model":
+        return get_lr_model()
+    if name == "text_model":
+        return get_text_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warmup():
+    """Load the forest and Gemini client now instead of on the first request (for servers)."""
+    math_model = get_math_model()
+    gemini = get_gemini_model()
+    if math_model is not None:
+        # First call pays sklearn's one-off validation setup (and the flat backend builds its batch tables)
+        _forest_risk_score_row([30, 5000, 10000, 36, 0.3, 5, 0])
+        _forest_risk_scores(pd.DataFrame([[30, 5000, 10000, 36, 0.3, 5, 0]], columns=FEATURE_COLUMNS))
+    status = {"rf_model": math_model is not None, "gemini": gemini is not None}
+    if CASCADE:
+        status["lr_model"] = get_lr_model() is not None
+    if TEXT_BACKEND == "local":
+        status["text_model"] = get_text_model() is not None
+    return status
+
+
+def _load_flat_forest():
+    from tree_eval import ArtifactError, FlatForest, source_changed
+    if os.path.isdir(RF_ARTIFACT_PATH):
+        try:
+            forest = FlatForest.load(RF_ARTIFACT_PATH, feature_names=FEATURE_COLUMNS)
+        except (OSError, ArtifactError) as e:
+            logger.error("❌ Forest artifact %s rejected (%s); flattening %s instead", RF_ARTIFACT_PATH, e, RF_MODEL_PATH)
+        else:
+            if source_changed(forest.manifest, RF_MODEL_PATH):
+                logger.warning("⚠️ %s differs from the pickle %s was exported from; re-run `python -m tree_eval export`",
+                               RF_MODEL_PATH, RF_ARTIFACT_PATH)
+            logger.info("✅ Forest artifact memory-mapped from %s", RF_ARTIFACT_PATH)
+            return forest
+    rf = get_rf_model()
+    return None if rf is None else FlatForest.from_sklearn(rf)
+
+
+def get_flat_forest():
+    """The forest as a tree_eval.FlatForest: the mmap'd artifact, else the flattened pickle.
+
+    Built once and cached; a lazy load of rf_model later (e.g. for get_explainer) keeps it.
+    A forest passed to set_rf_model() is flattened instead.
+    """
+    global _flat_forest
+    with _load_lock:
+        if _flat_forest is None:
+            if _rf_model_replaced:
+                from tree_eval import FlatForest
+                rf = get_rf_model()
+                _flat_forest = (None if rf is None else FlatForest.from_sklearn(rf),)
+            else:
+                _flat_forest = (_load_flat_forest(),)
+        return _flat_forest[0]
+
+
+def set_rf_model(forest):
+    """Replace the Random Forest (e.g. a bulk worker's --model); the flat arrays and TreeSHAP tables follow it."""
+    global rf_model, _flat_forest, _rf_model_replaced
+    with _load_lock:
+        rf_model = forest
+        _rf_model_replaced = True
+        _flat_forest = None
+        globals().pop("explainer", None)
+
+
+def get_math_model():
+    """Whatever the configured INFERENCE_BACKEND predicts with (None if there is no model)."""
+    return get_flat_forest() if INFERENCE_BACKEND == "flat" else get_rf_model()
+
+
+def _require_math_model():
+    math_model = get_math_model()
+    if math_model is None:
         raise ValueError("Model not loaded. Please run train_model.py first to generate baseline_model_rf.pkl")
-    
+    return math_model
+
+
+def _forest_risk_scores(frame):
+    """Random Forest probability of default (0-100) for every row of a DataFrame holding FEATURE_COLUMNS."""
+    math_model = _require_math_model()
     try:
-        # We must format the data exactly how your teammate trained it
-        # Features: ["age", "monthly_income", "loan_amount", "loan_term", "dti", "credit_history", "num_dependents"]
-        input_data = pd.DataFrame([[age, income, loan_amount, loan_term, dti, credit_history, dependents]], 
-                                  columns=["age", "monthly_income", "loan_amount", "loan_term", "dti", "credit_history", "num_dependents"])
-        
         # Get probability of default (0 to 1)
         # We multiply by 100 to make it a percentage
-        math_risk_score = rf_model.predict_proba(input_data)[0][1] * 100
+        with metrics.stage("math.predict"):
+            if INFERENCE_BACKEND == "flat":
+                return math_model.predict_batch(frame[FEATURE_COLUMNS].to_numpy(dtype=float)) * 100
+            return math_model.predict_proba(frame[FEATURE_COLUMNS])[:, 1] * 100
     except Exception as e:
         raise ValueError(f"Error calculating math risk score: {e}")
 
-    # --- PART 2: THE TEXT BRAIN (Enhanced LLM Analysis) ---
-    text_risk_score = 50  # Default fallback score
-    text_analysis = {}  # Store detailed analysis
-    use_fallback = False  # Flag to trigger enhanced fallback
-    
-    if model is not None:
-        prompt = f"""You are a credit risk analyst evaluating loan applications based on the applicant's stated purpose.
 
-Analyze the following loan application story across multiple risk dimensions:
+def _forest_risk_score_row(features):
+    """Random Forest probability of default (0-100) for one applicant, features in FEATURE_COLUMNS order."""
+    if INFERENCE_BACKEND == "flat":
+        math_model = _require_math_model()
+        try:
+            # No DataFrame and no sklearn dispatch: a few vectorized steps over the flat arrays
+            with metrics.stage("math.predict"):
+                return math_model.predict_row(np.asarray(features, dtype=float)) * 100
+        except Exception as e:
+            raise ValueError(f"Error calculating math risk score: {e}")
+    with metrics.stage("math.frame"):
+        frame = pd.DataFrame([features], columns=FEATURE_COLUMNS)
+    return _forest_risk_scores(frame)[0]
+
+
+def _lr_risk_scores(X):
+    """Logistic Regression probability of default (0-100) for a 2-D array: one dot product, no sklearn call."""
+    lr = get_lr_model()
+    if lr is None:
+        raise ValueError("Cascade mode needs baseline_model_lr.pkl. Please run train_model.py first")
+    with metrics.stage("math.lr"):
+        z = np.asarray(X, dtype=float) @ lr.coef_[0] + lr.intercept_[0]
+        return 100 / (1 + np.exp(-z))
+
+
+def in_uncertainty_band(math_scores, band=None):
+    """True where a math score is within `band` points of the review or reject cut-off."""
+    band = CASCADE_BAND if band is None else band
+    math_scores = np.asarray(math_scores, dtype=float)
+    return (np.abs(math_scores - REVIEW_THRESHOLD) <= band) | (np.abs(math_scores - REJECT_THRESHOLD) <= band)
+
+
+def _count_cascade(rows, forest_rows):
+    with _cascade_lock:
+        _cascade_counts["rows"] += rows
+        _cascade_counts["forest_rows"] += forest_rows
+
+
+def cascade_stats():
+    """How many rows the cascade scored and how many of them still needed the forest."""
+    with _cascade_lock:
+        rows, forest_rows = _cascade_counts["rows"], _cascade_counts["forest_rows"]
+    return {"rows": rows, "forest_rows": forest_rows,
+            "forest_avoided_rate": (rows - forest_rows) / rows if rows else 0.0}
+
+
+def _cascade_risk_scores(frame, band=None):
+    X = frame[FEATURE_COLUMNS].to_numpy(dtype=float)
+    scores = _lr_risk_scores(X)
+    uncertain = in_uncertainty_band(scores, band)
+    if uncertain.any():
+        # Only borderline rows pay for the forest
+        scores[uncertain] = _forest_risk_scores(frame[uncertain])
+    _count_cascade(len(scores), int(uncertain.sum()))
+    return scores
+
+
+def _math_risk_scores(frame):
+    """Probability of default (0-100) for every row of a DataFrame holding FEATURE_COLUMNS."""
+    if CASCADE:
+        return _cascade_risk_scores(frame)
+    return _forest_risk_scores(frame)
+
+
+def _math_risk_score_row(features):
+    """Probability of default (0-100) for one applicant, features in FEATURE_COLUMNS order."""
+    if CASCADE:
+        score = float(_lr_risk_scores([features])[0])
+        uncertain = bool(in_uncertainty_band(score))
+        if uncertain:
+            score = _forest_risk_score_row(features)
+        _count_cascade(1, int(uncertain))
+        return score
+    return _forest_risk_score_row(features)
+
+
+def _require_explainer():
+    explainer = get_explainer()
+    if explainer is None:
+        raise ValueError("Model not loaded. Please run train_model.py first to generate baseline_model_rf.pkl")
+    return explainer
+
+
+def explain_math_score_row(features):
+    """Exact per-feature contributions (points) to the forest's math score for one applicant.
+
+    Returns {"base": average score, "contributions": {feature: points}}; base plus the
+    contributions is the forest's score. In cascade mode Math_Score may be the LR score instead.
+    """
+    explainer = _require_explainer()
+    with metrics.stage("math.explain"):
+        contributions = explainer.shap_row(features) * 100
+    return {"base": round(explainer.expected_value * 100, 2),
+            "contributions": {name: round(float(c), 2) for name, c in zip(FEATURE_COLUMNS, contributions)}}
+
+
+def explain_math_scores(frame):
+    """Per-feature contributions (points) for every row of a DataFrame holding FEATURE_COLUMNS.
+
+    Returns a DataFrame aligned to frame.index with one `<feature>_contribution` column per feature.
+    """
+    explainer = _require_explainer()
+    with metrics.stage("math.explain"):
+        contributions = explainer.shap_batch(frame[FEATURE_COLUMNS].to_numpy(dtype=float)) * 100
+    return pd.DataFrame(contributions.round(2), index=frame.index,
+                        columns=[f"{name}_contribution" for name in FEATURE_COLUMNS])
 
-Applicant Story: "{user_story}"
 
-Evaluate these factors (each scored 0-100, where 0 is lowest risk and 100 is highest risk):
+_PROMPT_PREAMBLE = "You are a credit risk analyst evaluating loan applications based on the applicant's stated purpose."
+
+_PROMPT_RUBRIC = """Evaluate these factors (each scored 0-100, where 0 is lowest risk and 100 is highest risk):
 
 1. **Purpose Legitimacy** (0-100): Is the stated purpose credible, specific, and legitimate? Vague or suspicious purposes score higher.
 
@@ -67,108 +425,702 @@ Evaluate these factors (each scored 0-100, where 0 is lowest risk and 100 is hig
 
 4. **Clarity** (0-100): Is the explanation clear, detailed, and coherent? Vague or unclear stories score higher.
 
-5. **Red Flags** (0-100): Presence of high-risk indicators like gambling, debt consolidation, legal issues, or evasiveness.
+5. **Red Flags** (0-100): Presence of high-risk indicators like gambling, debt consolidation, legal issues, or evasiveness."""
 
-Provide your analysis in JSON format with this exact structure:
-{{
-  "purpose_legitimacy": <score 0-100>,
+_PROMPT_FIELDS = '''  "purpose_legitimacy": <score 0-100>,
   "financial_responsibility": <score 0-100>,
   "urgency_desperation": <score 0-100>,
   "clarity": <score 0-100>,
   "red_flags": <score 0-100>,
   "overall_risk": <weighted average score 0-100>,
   "confidence": <your confidence in this assessment 0-100>,
-  "explanation": "<brief 1-2 sentence explanation of the overall risk>"
+  "explanation": "<brief 1-2 sentence explanation of the overall risk>"'''
+
+# Scores every batched result must carry (numbers in 0-100)
+SCORE_FIELDS = ("purpose_legitimacy", "financial_responsibility", "urgency_desperation", "clarity",
+                "red_flags", "overall_risk")
+
+
+def _build_prompt(user_story):
+    return f"""{_PROMPT_PREAMBLE}
+
+Analyze the following loan application story across multiple risk dimensions:
+
+Applicant Story: "{user_story}"
+
+{_PROMPT_RUBRIC}
+
+Provide your analysis in JSON format with this exact structure:
+{{
+{_PROMPT_FIELDS}
 }}"""
-        
+
+
+def _build_batch_prompt(stories_by_id):
+    # Same rubric and fields as _build_prompt, so batched and single results share the story cache
+    applications = json.dumps([{"id": story_id, "story": story} for story_id, story in stories_by_id.items()],
+                              ensure_ascii=False)
+    fields = "\n".join("  " + line for line in _PROMPT_FIELDS.splitlines())
+    return f"""{_PROMPT_PREAMBLE}
+
+Analyze each of the following loan application stories independently across multiple risk dimensions.
+The stories are a JSON array of objects with an "id" and a "story":
+
+Applicant Stories: {applications}
+
+{_PROMPT_RUBRIC}
+
+Provide your analysis as a JSON array with exactly one object per story, copying each "id" exactly:
+[
+  {{
+    "id": "<the story's id>",
+{fields}
+  }}
+]"""
+
+
+def _generation_config():
+    import google.generativeai as genai
+    return genai.GenerationConfig(
+        temperature=0.3,  # Lower temperature for more consistent scoring
+        response_mime_type="application/json"
+    )
+
+
+def _parse_gemini_response(response):
+    text_analysis = json.loads(response.text)
+    text_risk_score = int(text_analysis.get('overall_risk', 50))
+
+    logger.info("✅ Gemini Analysis: Risk=%s, Confidence=%s. Explanation: %s", text_risk_score,
+                text_analysis.get('confidence', 'N/A'), text_analysis.get('explanation', 'N/A'))
+    return text_risk_score, text_analysis
+
+
+def _get_story_cache():
+    global _story_cache
+    if _story_cache is None and STORY_CACHE_ENABLED:
+        _story_cache = StoryCache(STORY_CACHE_PATH, max_disk_items=STORY_CACHE_MAX_ITEMS, ttl_s=STORY_CACHE_TTL_S)
+    return _story_cache
+
+
+def _story_namespace():
+    return f"{PROMPT_VERSION}\0{getattr(get_gemini_model(), 'model_name', GEMINI_MODEL_NAME)}"
+
+
+def _story_cache_key(user_story):
+    return cache_key(user_story, PROMPT_VERSION, getattr(get_gemini_model(), "model_name", GEMINI_MODEL_NAME))
+
+
+def _get_near_duplicates():
+    global _near_duplicates
+    if _near_duplicates is None and NEAR_DUP_ENABLED and _get_story_cache() is not None:
+        from near_duplicate import NearDuplicateIndex
+        _near_duplicates = NearDuplicateIndex(STORY_CACHE_PATH, threshold=NEAR_DUP_THRESHOLD,
+                                              max_items=STORY_CACHE_MAX_ITEMS)
+    return _near_duplicates
+
+
+def _cached_text_risk(user_story, key):
+    """A stored analysis of this story, or of a near-duplicate of it (flagged), else None."""
+    cache = _get_story_cache()
+    if cache is None:
+        return None
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    index = _get_near_duplicates()
+    match = index.find(user_story, _story_namespace()) if index is not None else None
+    if match is None:
+        return None
+    hit = cache.get(match["key"])
+    if hit is None:
+        return None  # the matched analysis has since expired from the story cache
+    text_risk_score, text_analysis = hit
+    text_analysis["near_duplicate"] = {"matched_key": match["key"], "similarity": match["similarity"],
+                                       "matched_story": match["preview"]}
+    logger.info("♻️ Reusing the analysis of a near-duplicate story (similarity %.2f)", match["similarity"])
+    return text_risk_score, text_analysis
+
+
+def _store_text_risk(user_story, key, text_risk_score, text_analysis):
+    cache = _get_story_cache()
+    if cache is None:
+        return
+    cache.put(key, text_risk_score, text_analysis, story=user_story)
+    index = _get_near_duplicates()
+    if index is not None:
+        index.add(key, user_story, _story_namespace())
+
+
+def _gemini_text_risk(user_story):
+    """Ask Gemini to score the story. Raises on any API or parsing error."""
+    key = _story_cache_key(user_story)
+    with metrics.stage("text.cache"):
+        hit = _cached_text_risk(user_story, key)
+    if hit is not None:
+        return hit
+
+    scheduler = get_llm_scheduler()
+    if scheduler is not None:
+        with metrics.stage("text.quota_wait"):
+            if not scheduler.acquire(INTERACTIVE, timeout=GEMINI_DEADLINE_S):
+                raise TimeoutError(f"no Gemini quota within {GEMINI_DEADLINE_S}s")
+    with metrics.stage("text.llm"):
+        response = get_gemini_model().generate_content(
+            _build_prompt(user_story),
+            generation_config=_generation_config(),
+            request_options={"timeout": GEMINI_DEADLINE_S}  # never block a worker forever
+        )
+    with metrics.stage("text.parse"):
+        text_risk_score, text_analysis = _parse_gemini_response(response)
+    _store_text_risk(user_story, key, text_risk_score, text_analysis)
+    return text_risk_score, text_analysis
+
+
+def get_llm_scheduler():
+    """The process-wide Gemini quota scheduler, or None when GEMINI_RPM is 0 (unlimited)."""
+    global _llm_scheduler
+    if GEMINI_RPM <= 0:
+        return None
+    with _load_lock:
+        if _llm_scheduler is None or _llm_scheduler.rate_per_s != GEMINI_RPM / 60:
+            _llm_scheduler = RateLimitScheduler(GEMINI_RPM, burst=GEMINI_BURST,
+                                                max_bulk_waiting=GEMINI_BULK_MAX_WAITING)
+        return _llm_scheduler
+
+
+def llm_scheduler_stats():
+    """Queue depth and wait times per priority, or None without a quota."""
+    scheduler = get_llm_scheduler()
+    return None if scheduler is None else scheduler.stats()
+
+
+def _get_async_client():
+    # Rebuilt whenever `model` is swapped (e.g. for gemini_stub in tests) or the quota changes
+    global _async_client
+    gemini = get_gemini_model()
+    scheduler = get_llm_scheduler()
+    if _async_client is None or _async_client.model is not gemini or _async_client.scheduler is not scheduler:
+        _async_client = AsyncGeminiClient(gemini, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                                          deadline_s=GEMINI_DEADLINE_S, max_retries=GEMINI_MAX_RETRIES,
+                                          scheduler=scheduler)
+    return _async_client
+
+
+async def _gemini_text_risk_async(user_story, priority=INTERACTIVE):
+    key = _story_cache_key(user_story)
+    with metrics.stage("text.cache"):
+        hit = _cached_text_risk(user_story, key)
+    if hit is not None:
+        return hit
+
+    # Includes any wait for quota or a concurrency slot inside the client
+    with metrics.stage("text.llm"):
+        response = await _get_async_client().generate(_build_prompt(user_story), priority=priority,
+                                                      generation_config=_generation_config())
+    with metrics.stage("text.parse"):
+        text_risk_score, text_analysis = _parse_gemini_response(response)
+    _store_text_risk(user_story, key, text_risk_score, text_analysis)
+    return text_risk_score, text_analysis
+
+
+def _valid_score(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 100
+
+
+def _parse_batch_response(response, stories_by_id):
+    """{id: (text_risk_score, text_analysis)} for every well-formed entry of a batched reply.
+
+    Entries with an unknown or repeated id, or a missing/non-numeric score, are
+    dropped; their stories are simply absent from the result.
+    """
+    try:
+        entries = json.loads(response.text)
+    except (ValueError, TypeError) as e:
+        logger.warning("⚠️ Unparseable batched Gemini reply (%s); re-queueing %d stories", e, len(stories_by_id))
+        return {}
+    if isinstance(entries, dict):
+        entries = entries.get("results", entries.get("analyses", []))
+    if not isinstance(entries, list):
+        return {}
+
+    parsed, seen = {}, set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        story_id = entry.get("id")
+        if not isinstance(story_id, str) or story_id not in stories_by_id:
+            continue
+        if story_id in seen:
+            # Two answers for one story: trust neither
+            parsed.pop(story_id, None)
+            continue
+        seen.add(story_id)
+        if all(_valid_score(entry.get(field)) for field in SCORE_FIELDS):
+            text_analysis = {k: v for k, v in entry.items() if k != "id"}
+            parsed[story_id] = (int(text_analysis["overall_risk"]), text_analysis)
+    return parsed
+
+
+def _pack_story_batches(stories, max_stories=None, max_chars=None):
+    """Split stories into prompt-sized batches, in order.
+
+    A batch closes at max_stories or once its stories reach max_chars, so short
+    stories travel many per request and long ones few (a story over the budget
+    goes alone).
+    """
+    max_stories = max_stories or GEMINI_BATCH_MAX_STORIES
+    max_chars = max_chars or GEMINI_BATCH_MAX_CHARS
+    batches, batch, chars = [], [], 0
+    for story in stories:
+        size = len(story) + _BATCH_ENTRY_OVERHEAD
+        if batch and (len(batch) >= max_stories or chars + size > max_chars):
+            batches.append(batch)
+            batch, chars = [], 0
+        batch.append(story)
+        chars += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _count_story_batch(**increments):
+    with _story_batch_lock:
+        for name, value in increments.items():
+            _story_batch_counts[name] += value
+
+
+def story_batch_stats():
+    """Batched Gemini requests sent, stories they carried and stories re-queued individually."""
+    with _story_batch_lock:
+        return dict(_story_batch_counts)
+
+
+async def _gemini_story_batch_async(batch):
+    stories_by_id = {f"s{i}": story for i, story in enumerate(batch)}
+    _count_story_batch(requests=1, stories=len(batch))
+    try:
+        response = await _get_async_client().generate(_build_batch_prompt(stories_by_id),
+                                                      deadline_s=GEMINI_BATCH_DEADLINE_S, priority=BULK,
+                                                      generation_config=_generation_config())
+    except asyncio.TimeoutError as e:
+        metrics.record_llm_error(e)
+        logger.warning("⚠️ Batched Gemini deadline of %ss expired; re-queueing %d stories",
+                       GEMINI_BATCH_DEADLINE_S, len(batch))
+        return {}
+    except Exception as e:
+        metrics.record_llm_error(e)
+        logger.warning("⚠️ Batched Gemini API error: %s; re-queueing %d stories", e, len(batch))
+        return {}
+    parsed = _parse_batch_response(response, stories_by_id)
+    return {stories_by_id[story_id]: result for story_id, result in parsed.items()}
+
+
+async def _gemini_text_risk_batch_async(stories):
+    """Text risk for distinct stories, many stories per Gemini request.
+
+    Cached stories (and near-duplicates of them) are answered from the story
+    cache. Every story a batch
+    fails to return (missing id, malformed entry, failed request) is re-queued
+    as its own single-story request, which has the usual keyword fallback.
+    """
+    results, pending = {}, []
+    for story in stories:
+        hit = _cached_text_risk(story, _story_cache_key(story))
+        if hit is not None:
+            results[story] = hit
+        else:
+            pending.append(story)
+
+    batches = _pack_story_batches(pending)
+    # A one-story batch is just a single request
+    singles = [batch[0] for batch in batches if len(batch) == 1]
+    batches = [batch for batch in batches if len(batch) > 1]
+    requeue = []
+    for batch, answered in zip(batches, await asyncio.gather(*(_gemini_story_batch_async(b) for b in batches))):
+        for story in batch:
+            if story in answered:
+                results[story] = answered[story]
+                _store_text_risk(story, _story_cache_key(story), *answered[story])
+            else:
+                requeue.append(story)
+    if requeue:
+        _count_story_batch(requeued=len(requeue))
+        logger.info("Re-queueing %d of %d stories as single Gemini requests", len(requeue), len(pending))
+    retries = singles + requeue
+    results.update(zip(retries, await asyncio.gather(*(_text_risk_async(story, BULK) for story in retries))))
+    return results
+
+
+def _fallback_score(high_risk_count, medium_risk_count, low_risk_count, word_count):
+    # Story length and clarity analysis
+    clarity_penalty = 0
+    if word_count < 5:
+        clarity_penalty = 20  # Very vague
+    elif word_count < 10:
+        clarity_penalty = 10  # Somewhat vague
+
+    # Calculate risk score with weighted factors
+    base_score = 50
+    risk_adjustment = (high_risk_count * 15) + (medium_risk_count * 8) - (low_risk_count * 12)
+
+    text_risk_score = max(0, min(100, base_score + risk_adjustment + clarity_penalty))
+
+    text_analysis = {
+        "fallback": True,
+        "high_risk_matches": high_risk_count,
+        "medium_risk_matches": medium_risk_count,
+        "low_risk_matches": low_risk_count,
+        "word_count": word_count,
+        "clarity_penalty": clarity_penalty
+    }
+    return text_risk_score, text_analysis
+
+
+def _fallback_text_risk(user_story):
+    """Enhanced Fallback: Sophisticated heuristic analysis"""
+    # Count keyword matches in one compiled pass (see keyword_scorer)
+    high_risk_count, medium_risk_count, low_risk_count = count_keywords(user_story)
+    return _fallback_score(high_risk_count, medium_risk_count, low_risk_count, len(user_story.split()))
+
+
+def _fallback_text_risk_batch(stories):
+    """_fallback_text_risk for a list of distinct stories."""
+    with metrics.stage("text.fallback"):
+        return {story: _fallback_text_risk(story) for story in stories}
+
+
+def _text_risk(user_story):
+    """Local model or Gemini analysis, depending on TEXT_BACKEND; keyword fallback otherwise."""
+    if TEXT_BACKEND == "local":
+        text_model = get_text_model()
+        if text_model is not None:
+            with metrics.stage("text.local_model"):
+                return text_model.analyse(user_story)
+    elif get_gemini_model() is not None:
         try:
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    temperature=0.3,  # Lower temperature for more consistent scoring
-                    response_mime_type="application/json"
-                )
-            )
-            
-            import json
-            text_analysis = json.loads(response.text)
-            text_risk_score = int(text_analysis.get('overall_risk', 50))
-            
-            print(f"✅ Gemini Analysis: Risk={text_risk_score}, Confidence={text_analysis.get('confidence', 'N/A')}")
-            print(f"   Explanation: {text_analysis.get('explanation', 'N/A')}")
-            
+            return _gemini_text_risk(user_story)
         except Exception as e:
-            print(f"⚠️ Gemini API error: {e}. Using enhanced fallback.")
-            # Trigger enhanced fallback instead of using simple default
-            use_fallback = True
-    else:
-        use_fallback = True
-    
-    if use_fallback:
-        # Enhanced Fallback: Sophisticated heuristic analysis
-        print("⚠️ Using enhanced fallback text analysis (no OpenAI API key)")
-        
-        # Expanded keyword lists
-        high_risk_keywords = [
-            'gambling', 'casino', 'lottery', 'bet', 'poker',
-            'debt', 'owe', 'collection', 'bankruptcy', 'foreclosure',
-            'desperate', 'urgent', 'emergency', 'asap', 'immediately',
-            'legal trouble', 'lawsuit', 'court', 'fine', 'penalty',
-            'loan shark', 'payday', 'cash advance'
-        ]
-        
-        medium_risk_keywords = [
-            'bills', 'overdue', 'late payment', 'catch up',
-            'unexpected', 'surprise', 'didn\'t plan',
-            'personal reasons', 'rather not say', 'private'
-        ]
-        
-        low_risk_keywords = [
-            'business', 'expansion', 'investment', 'equipment',
-            'education', 'training', 'certification', 'degree',
-            'home improvement', 'renovation', 'repair',
-            'medical', 'healthcare', 'treatment',
-            'consolidation', 'refinance', 'lower interest',
-            'startup', 'entrepreneur', 'venture', 'project'
-        ]
-        
-        story_lower = user_story.lower()
-        
-        # Count keyword matches
-        high_risk_count = sum(1 for word in high_risk_keywords if word in story_lower)
-        medium_risk_count = sum(1 for word in medium_risk_keywords if word in story_lower)
-        low_risk_count = sum(1 for word in low_risk_keywords if word in story_lower)
-        
-        # Story length and clarity analysis
-        word_count = len(user_story.split())
-        clarity_penalty = 0
-        if word_count < 5:
-            clarity_penalty = 20  # Very vague
-        elif word_count < 10:
-            clarity_penalty = 10  # Somewhat vague
-        
-        # Calculate risk score with weighted factors
-        base_score = 50
-        risk_adjustment = (high_risk_count * 15) + (medium_risk_count * 8) - (low_risk_count * 12)
-        
-        text_risk_score = max(0, min(100, base_score + risk_adjustment + clarity_penalty))
-        
-        text_analysis = {
-            "fallback": True,
-            "high_risk_matches": high_risk_count,
-            "medium_risk_matches": medium_risk_count,
-            "low_risk_matches": low_risk_count,
-            "word_count": word_count,
-            "clarity_penalty": clarity_penalty
-        }
-
-    # --- PART 3: FUSION (The Hackathon Requirement) ---
+            metrics.record_llm_error(e)
+            logger.warning("⚠️ Gemini API error: %s. Using enhanced fallback.", e)
+
+    logger.info("⚠️ Using enhanced fallback text analysis (no text model, no Gemini API key or Gemini failed)")
+    with metrics.stage("text.fallback"):
+        return _fallback_text_risk(user_story)
+
+
+async def _text_risk_async(user_story, priority=INTERACTIVE):
+    if TEXT_BACKEND == "local":
+        return _text_risk(user_story)
+    if get_gemini_model() is not None:
+        try:
+            return await _gemini_text_risk_async(user_story, priority)
+        except asyncio.TimeoutError as e:
+            metrics.record_llm_error(e)
+            logger.warning("⚠️ Gemini deadline of %ss expired. Using enhanced fallback.", GEMINI_DEADLINE_S)
+        except Exception as e:
+            metrics.record_llm_error(e)
+            logger.warning("⚠️ Gemini API error: %s. Using enhanced fallback.", e)
+
+    with metrics.stage("text.fallback"):
+        return _fallback_text_risk(user_story)
+
+
+def _analyse_stories(stories):
+    """Text risk for each distinct story; Gemini calls run concurrently under the client's limits."""
+    if TEXT_BACKEND == "local" and get_text_model() is not None:
+        with metrics.stage("text.local_model"):
+            return get_text_model().analyse_batch(stories) if stories else {}
+    if TEXT_BACKEND == "local" or get_gemini_model() is None:
+        if stories:
+            logger.info("⚠️ Using enhanced fallback text analysis (no text model or Gemini API key)")
+        return _fallback_text_risk_batch(stories)
+
+    if GEMINI_BATCH:
+        return asyncio.run(_gemini_text_risk_batch_async(stories))
+
+    async def analyse_all():
+        results = await asyncio.gather(*(_text_risk_async(story, BULK) for story in stories))
+        return dict(zip(stories, results))
+
+    return asyncio.run(analyse_all())
+
+
+def decision_for(final_risk):
+    if final_risk > REJECT_THRESHOLD:
+        return "REJECT"
+    elif final_risk > REVIEW_THRESHOLD:
+        return "MANUAL REVIEW"
+    return "APPROVE"
+
+
+def decision_bounds():
+    """(approve_at_or_below, reject_above) on the math score: outside this band the text score cannot matter."""
+    approve_below = (REVIEW_THRESHOLD - 100 * TEXT_WEIGHT) / MATH_WEIGHT
+    reject_above = REJECT_THRESHOLD / MATH_WEIGHT
+    return approve_below, reject_above
+
+
+def _math_decides(math_risk_score):
+    # The text score lives in [0, 100]; if both extremes give the same decision it cannot change it.
+    # Compare the rounded finals, since that is what the decision is taken on.
+    lowest = round(math_risk_score * MATH_WEIGHT, 1)
+    highest = round(math_risk_score * MATH_WEIGHT + 100 * TEXT_WEIGHT, 1)
+    return decision_for(lowest) == decision_for(highest)
+
+
+def _math_decides_batch(math_scores):
+    def codes(final):
+        return np.select([final > REJECT_THRESHOLD, final > REVIEW_THRESHOLD], [2, 1], 0)
+    lowest = (math_scores * MATH_WEIGHT).round(1)
+    highest = (math_scores * MATH_WEIGHT + 100 * TEXT_WEIGHT).round(1)
+    return pd.Series(codes(lowest) == codes(highest), index=math_scores.index)
+
+
+def _short_circuit_text_risk(user_story):
+    # Decision is already fixed: fill the text slot with the free keyword score instead of calling Gemini
+    with metrics.stage("text.fallback"):
+        text_risk_score, text_analysis = _fallback_text_risk(user_story)
+    text_analysis["short_circuit"] = True
+    return text_risk_score, text_analysis
+
+
+def _fuse(math_risk_score, text_risk_score, text_analysis):
     # We weigh the Math model 70% and the Text model 30%
-    final_score = (math_risk_score * 0.7) + (text_risk_score * 0.3)
-    
+    final_score = (math_risk_score * MATH_WEIGHT) + (text_risk_score * TEXT_WEIGHT)
+
     return {
         "Math_Score": round(math_risk_score, 1),
         "Text_Score": text_risk_score,
         "Final_Risk": round(final_score, 1),
         "Text_Analysis": text_analysis  # Include detailed LLM analysis
-    }
\ No newline at end of file
+    }
+
+
+def _get_stage_pool():
+    # Shared by every get_total_risk call; the text stage is I/O-bound so a few threads go a long way
+    global _stage_pool
+    if _stage_pool is None:
+        _stage_pool = concurrent.futures.ThreadPoolExecutor(max_workers=STAGE_POOL_WORKERS, thread_name_prefix="risk-text")
+    return _stage_pool
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def _timed_async(awaitable):
+    start = time.perf_counter()
+    result = await awaitable
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _timings(math_ms, text_ms, started, stages):
+    return {
+        "math_ms": round(math_ms, 2),
+        "text_ms": round(text_ms, 2),
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        "critical_path": "math" if math_ms >= text_ms else "text",
+        # Breakdown inside the two stages: math.frame/predict/lr, text.cache/llm/parse/fallback/...
+        "stages": metrics.rounded(stages),
+    }
+
+
+def _finish(result, mode, started):
+    metrics.record_request(mode, time.perf_counter() - started, result["Text_Analysis"])
+    if timing_logger.isEnabledFor(logging.INFO):
+        timing_logger.info("scored final=%s %s", result["Final_Risk"], json.dumps(result["Timings"]))
+    return result
+
+
+def get_total_risk(age, income, loan_amount, loan_term, dti, credit_history, dependents, user_story, early_exit=None):
+    """Fused risk for one applicant.
+
+    With early_exit (default: RISK_EARLY_EXIT), Gemini is skipped when the math score
+    alone fixes the decision; the result then carries "Short_Circuit".
+    """
+    early_exit = EARLY_EXIT if early_exit is None else early_exit
+    started = time.perf_counter()
+    with metrics.collect_stages() as stages:
+        # --- PART 2 runs in the background: THE TEXT BRAIN (Enhanced LLM Analysis) ---
+        # Early exit needs the math score first, so it stays sequential
+        text_future = None
+        if not early_exit:
+            # The context copy lets the worker thread add its stage times to this request
+            text_future = _get_stage_pool().submit(contextvars.copy_context().run, _timed, _text_risk, user_story)
+
+        # --- PART 1: THE MATH BRAIN (Teammate's Code) ---
+        # We must format the data exactly how your teammate trained it
+        features = [age, income, loan_amount, loan_term, dti, credit_history, dependents]
+        math_risk_score, math_ms = _timed(_math_risk_score_row, features)
+
+        # --- Join the text stage ---
+        short_circuit = False
+        if text_future is not None:
+            try:
+                (text_risk_score, text_analysis), text_ms = text_future.result(timeout=GEMINI_DEADLINE_S)
+            except concurrent.futures.TimeoutError as e:
+                # Don't wait on a stuck stage thread; it finishes in the background
+                metrics.record_llm_error(e)
+                logger.warning("⚠️ Text stage missed the %ss deadline. Using enhanced fallback.", GEMINI_DEADLINE_S)
+                with metrics.stage("text.fallback"):
+                    (text_risk_score, text_analysis), text_ms = _timed(_fallback_text_risk, user_story)
+        elif _math_decides(math_risk_score):
+            short_circuit = True
+            (text_risk_score, text_analysis), text_ms = _timed(_short_circuit_text_risk, user_story)
+        else:
+            (text_risk_score, text_analysis), text_ms = _timed(_text_risk, user_story)
+
+        # --- PART 3: FUSION (The Hackathon Requirement) ---
+        with metrics.stage("fusion"):
+            result = _fuse(math_risk_score, text_risk_score, text_analysis)
+    if early_exit:
+        result["Short_Circuit"] = short_circuit
+    result["Timings"] = _timings(math_ms, text_ms, started, stages)
+    return _finish(result, "single", started)
+
+
+async def _math_risk_score_async(features):
+    return await asyncio.to_thread(_math_risk_score_row, features)
+
+
+async def get_total_risk_async(age, income, loan_amount, loan_term, dti, credit_history, dependents, user_story,
+                               early_exit=None, priority=INTERACTIVE, math_scorer=None, mode="async"):
+    """Async get_total_risk: the forest runs in a thread while Gemini is awaited.
+
+    `math_scorer` is an async callable taking the feature list (e.g. the API's
+    micro-batcher); by default the forest runs in a worker thread. `priority`
+    is the Gemini quota class and `mode` the label the request is counted under.
+    """
+    early_exit = EARLY_EXIT if early_exit is None else early_exit
+    math_scorer = math_scorer or _math_risk_score_async
+    started = time.perf_counter()
+    features = [age, income, loan_amount, loan_term, dti, credit_history, dependents]
+    # asyncio tasks and to_thread copy the context, so both stages report into `stages`
+    with metrics.collect_stages() as stages:
+        if not early_exit:
+            (math_risk_score, math_ms), ((text_risk_score, text_analysis), text_ms) = await asyncio.gather(
+                _timed_async(math_scorer(features)),
+                _timed_async(_text_risk_async(user_story, priority))
+            )
+            with metrics.stage("fusion"):
+                result = _fuse(math_risk_score, text_risk_score, text_analysis)
+            result["Timings"] = _timings(math_ms, text_ms, started, stages)
+            return _finish(result, mode, started)
+
+        # Early exit needs the math score before deciding whether to call Gemini at all
+        math_risk_score, math_ms = await _timed_async(math_scorer(features))
+        short_circuit = _math_decides(math_risk_score)
+        if short_circuit:
+            (text_risk_score, text_analysis), text_ms = _timed(_short_circuit_text_risk, user_story)
+        else:
+            (text_risk_score, text_analysis), text_ms = await _timed_async(_text_risk_async(user_story, priority))
+        with metrics.stage("fusion"):
+            result = _fuse(math_risk_score, text_risk_score, text_analysis)
+    result["Short_Circuit"] = short_circuit
+    result["Timings"] = _timings(math_ms, text_ms, started, stages)
+    return _finish(result, mode, started)
+
+
+def get_total_risk_batch(df, chunk_size=50_000, early_exit=None):
+    """Score a whole DataFrame of applicants.
+
+    `df` needs the FEATURE_COLUMNS and may carry a `user_story` column (missing
+    stories are scored as empty text). The Random Forest runs once per chunk of
+    `chunk_size` rows and each distinct story is analysed only once. Returns a
+    DataFrame with the same keys as get_total_risk, aligned to df.index.
+    """
+    early_exit = EARLY_EXIT if early_exit is None else early_exit
+    started = time.perf_counter()
+    missing = [c for c in FEATURE_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+
+    # --- PART 1: THE MATH BRAIN, one predict_proba per chunk ---
+    math_parts = []
+    for start in range(0, len(df), chunk_size):
+        math_parts.append(_math_risk_scores(df.iloc[start:start + chunk_size]))
+    math_scores = pd.Series(np.concatenate(math_parts) if math_parts else [], index=df.index, dtype=float)
+
+    # --- PART 2: THE TEXT BRAIN, once per distinct story ---
+    if "user_story" in df.columns:
+        stories = df["user_story"].fillna("").astype(str)
+    else:
+        stories = pd.Series("", index=df.index)
+    if early_exit:
+        decided = _math_decides_batch(math_scores)
+    else:
+        decided = pd.Series(False, index=df.index)
+    analysed = _analyse_stories(list(stories[~decided].unique()))
+    skipped = _fallback_text_risk_batch(list(stories[decided].unique()))
+    for _, text_analysis in skipped.values():
+        text_analysis["short_circuit"] = True
+    text_results = [(skipped if d else analysed)[s] for s, d in zip(stories, decided)]
+    text_scores = pd.Series([r[0] for r in text_results], index=df.index)
+    text_analyses = pd.Series([r[1] for r in text_results], index=df.index, dtype=object)
+
+    # --- PART 3: FUSION ---
+    final_scores = (math_scores * MATH_WEIGHT) + (text_scores * TEXT_WEIGHT)
+
+    results = pd.DataFrame({
+        "Math_Score": math_scores.round(1),
+        "Text_Score": text_scores,
+        "Final_Risk": final_scores.round(1),
+        "Text_Analysis": text_analyses
+    }, index=df.index)
+    if early_exit:
+        results["Short_Circuit"] = decided
+    if metrics.ENABLED:
+        metrics.REQUESTS.inc(len(df), mode="batch")
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, mode="batch")
+        for source, count in text_analyses.map(metrics.text_source).value_counts().items():
+            metrics.TEXT_SOURCES.inc(int(count), source=source)
+    return results
+
+
+def get_total_risk_records(records, chunk_size=50_000, early_exit=None):
+    """List-of-dicts variant of get_total_risk_batch.
+
+    Each record uses the get_total_risk keyword names (`income`, `dependents`, ...);
+    the trained column names (`monthly_income`, `num_dependents`) are accepted too.
+    Returns one get_total_risk-shaped dict per record, in order.
+    """
+    frame = pd.DataFrame.from_records(list(records))
+    frame = frame.rename(columns={"income": "monthly_income", "dependents": "num_dependents"})
+    results = get_total_risk_batch(frame, chunk_size=chunk_size, early_exit=early_exit)
+    return results.to_dict("records")
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m risk_engine", description="DeepCheck risk engine command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    score = commands.add_parser("score", help="Bulk-score a CSV or JSONL file of applicants")
+    score.add_argument("input", help="CSV or JSONL with the trained feature columns (+ optional user_story)")
+    score.add_argument("output", help="Destination CSV or JSONL, written incrementally")
+    score.add_argument("--chunk-size", type=int, default=10_000, help="Rows per chunk (default: 10000)")
+    score.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    score.add_argument("--model", default="baseline_model_rf.pkl", help="Random Forest pickle to load in each worker")
+    score.add_argument("--offline", action="store_true", help="Skip Gemini and use the keyword fallback")
+    score.add_argument("--early-exit", action="store_true", help="Skip the text stage when the math score decides")
+    score.add_argument("--gemini-batch", action="store_true", help="Pack several stories into each Gemini request")
+    score.add_argument("--no-resume", action="store_true", help="Ignore any checkpoint and start from scratch")
+    score.add_argument("--explain", action="store_true", help="Add per-feature TreeSHAP contributions to the math score")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    if args.command == "score":
+        from bulk_score import score_file
+        rows = score_file(args.input, args.output, chunk_size=args.chunk_size, workers=args.workers,
+                          model_path=args.model, offline=args.offline, early_exit=args.early_exit,
+                          resume=not args.no_resume, gemini_batch=args.gemini_batch, explain=args.explain)
+        print(f"✅ Scored {rows:,} rows into {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Two-tier cache for Gemini story analyses.
+
+Tier 1 is a bounded in-process LRU; tier 2 is a SQLite file shared by every
+process on the host. Keys hash the normalised story together with the prompt
+version and model name, so changing either never serves stale analyses.
+Entries expire after `ttl_s`, and the disk tier is trimmed back to
+`max_disk_items` by last access. When `put` is given the story, it is kept
+next to the analysis so text_model.py can later distil the stored analyses
+into a local model.
+"""
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def normalize_story(user_story):
+    # Case and whitespace don't change what the applicant said
+    return " ".join(user_story.split()).casefold()
+
+
+def cache_key(user_story, prompt_version, model_name):
+    raw = f"{prompt_version}\0{model_name}\0{normalize_story(user_story)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class StoryCache:
+    def __init__(self, path="story_cache.sqlite", max_memory_items=2048, max_disk_items=200_000,
+                 ttl_s=30 * 24 * 3600, trim_every=500):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl_s = ttl_s
+        self.trim_every = trim_every
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts_since_trim = 0
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS story_cache (
+                                    key TEXT PRIMARY KEY,
+                                    value TEXT NOT NULL,
+                                    created_at REAL NOT NULL,
+                                    accessed_at REAL NOT NULL)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_story_cache_accessed ON story_cache (accessed_at)")
+
+    def _remember(self, key, created_at, value):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """(score, analysis) for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_s:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    score, analysis = entry[1]
+                    return score, dict(analysis)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created_at FROM story_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl_s:
+                    self._db.execute("UPDATE story_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    stored = json.loads(row[0])
+                    value = (stored["score"], stored["analysis"])
+                    self._remember(key, row[1], value)
+                    self.disk_hits += 1
+                    return value[0], dict(value[1])
+
+            self.misses += 1
+            return None
+
+    def put(self, key, score, analysis, story=None):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, (score, dict(analysis)))
+            if self._db is None:
+                return
+            stored = {"score": score, "analysis": analysis}
+            if story is not None:
+                stored["story"] = story
+            self._db.execute("INSERT OR REPLACE INTO story_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                             (key, json.dumps(stored), now, now))
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= self.trim_every:
+                self._trim(now)
+
+    def _trim(self, now):
+        # Expired rows first, then the least recently used beyond the size cap
+        self._puts_since_trim = 0
+        removed = self._db.execute("DELETE FROM story_cache WHERE created_at < ?", (now - self.ttl_s,)).rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM story_cache").fetchone()[0]
+        if count > self.max_disk_items:
+            removed += self._db.execute(
+                "DELETE FROM story_cache WHERE key IN (SELECT key FROM story_cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_items,)).rowcount
+        self.evictions += removed
+
+    def trim(self):
+        with self._lock:
+            if self._db is not None:
+                self._trim(time.time())
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM story_cache")
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self._memory),
+        }
@@ -0,0 +1,243 @@
+"""Local text-risk model distilled from stored Gemini analyses.
+
+A third text backend next to Gemini and the keyword fallback. Stories are
+hashed into unigram+bigram features (HashingVectorizer, no vocabulary to
+store) and weighted by TF-IDF. One ridge regression per prompt dimension
+(purpose_legitimacy ... red_flags, plus overall_risk) is trained to
+reproduce the scores Gemini gave. Training data comes from the story cache
+(risk_engine stores the story next to each analysis) and from
+`python -m risk_engine score` outputs, which carry user_story and
+Text_Analysis columns.
+
+    python text_model.py train --cache story_cache.sqlite --scored scored.jsonl
+    RISK_TEXT_BACKEND=local streamlit run app.py
+
+Single stories skip sklearn's vectorizer and estimator calls: tokens are
+hashed with its murmurhash3_32 (the only sklearn function used), the TF-IDF
+weights looked up and the ridge coefficients gathered, which takes tens of
+microseconds. Training holds out a share of the stories and reports
+agreement with Gemini on them; the report is saved with the model.
+"""
+import argparse
+import collections
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+DIMENSIONS = ("purpose_legitimacy", "financial_responsibility", "urgency_desperation", "clarity", "red_flags",
+              "overall_risk")
+N_FEATURES = 2 ** 18
+# Same tokens as sklearn's default token_pattern, lowercased
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+
+def _risk_band(scores):
+    # Text-score bands on the engine's cut-offs: 0 low, 1 medium, 2 high
+    return np.digitize(scores, [40, 60], right=True)
+
+
+def agreement(gemini, local):
+    """Agreement between two (n, len(DIMENSIONS)) score arrays, per dimension and on overall_risk bands."""
+    report = {}
+    for i, dimension in enumerate(DIMENSIONS):
+        diff = np.abs(gemini[:, i] - local[:, i])
+        corr = np.corrcoef(gemini[:, i], local[:, i])[0, 1] if gemini[:, i].std() and local[:, i].std() else 0.0
+        report[dimension] = {"mae": round(float(diff.mean()), 2), "within_10": round(float((diff <= 10).mean()), 4),
+                             "pearson_r": round(float(corr), 4)}
+    overall = DIMENSIONS.index("overall_risk")
+    report["overall_band_agreement"] = round(float((_risk_band(gemini[:, overall])
+                                                    == _risk_band(local[:, overall])).mean()), 4)
+    return report
+
+
+class LocalTextModel:
+    def __init__(self, idf, coef, intercept, n_features=N_FEATURES, report=None):
+        self.idf = idf
+        self.coef = coef
+        self.intercept = intercept
+        self.n_features = n_features
+        self.report = report or {}
+
+    @staticmethod
+    def _vectorizer():
+        from sklearn.feature_extraction.text import HashingVectorizer
+        return HashingVectorizer(n_features=N_FEATURES, ngram_range=(1, 2), alternate_sign=False, norm=None)
+
+    @classmethod
+    def fit(cls, stories, targets, alpha=1.0):
+        """Fit on stories and an (n, len(DIMENSIONS)) array of Gemini scores."""
+        from sklearn.feature_extraction.text import TfidfTransformer
+        from sklearn.linear_model import Ridge
+        counts = cls._vectorizer().transform(stories)
+        tfidf = TfidfTransformer(sublinear_tf=True)
+        X = tfidf.fit_transform(counts)
+        ridge = Ridge(alpha=alpha).fit(X, np.asarray(targets, dtype=float))
+        return cls(tfidf.idf_, ridge.coef_, ridge.intercept_)
+
+    def predict_batch(self, stories):
+        """(n, len(DIMENSIONS)) scores in 0-100 for a list of stories."""
+        from sklearn.preprocessing import normalize
+        counts = self._vectorizer().transform(stories)
+        counts.data = 1 + np.log(counts.data)  # sublinear tf, as in training
+        X = normalize(counts.multiply(self.idf).tocsr())
+        return np.clip(X @ self.coef.T + self.intercept, 0, 100)
+
+    def predict(self, user_story):
+        """Scores for one story, computed directly from the hashed features.
+
+        Uses sklearn's murmurhash3_32 so the buckets match HashingVectorizer, but no
+        vectorizer, transformer or estimator call.
+        """
+        from sklearn.utils import murmurhash3_32
+        tokens = _TOKEN_RE.findall(user_story.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            return np.clip(self.intercept, 0, 100)
+        counts = collections.Counter(abs(murmurhash3_32(f, seed=0)) % self.n_features for f in features)
+        index = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        weights = np.fromiter((1 + math.log(c) for c in counts.values()), dtype=float, count=len(counts))
+        weights *= self.idf[index]
+        weights /= np.sqrt(weights @ weights)
+        return np.clip(self.coef[:, index] @ weights + self.intercept, 0, 100)
+
+    def _analysis(self, scores):
+        analysis = {dimension: int(round(score)) for dimension, score in zip(DIMENSIONS, scores)}
+        # Confidence = how often the model landed within 10 points of Gemini on held-out stories
+        within = self.report.get("holdout", {}).get("overall_risk", {}).get("within_10")
+        analysis["confidence"] = int(round(within * 100)) if within is not None else "N/A"
+        analysis["explanation"] = "Scored by the local text model distilled from earlier Gemini analyses."
+        analysis["local_model"] = True
+        return analysis["overall_risk"], analysis
+
+    def analyse(self, user_story):
+        """(text_risk_score, text_analysis) shaped like a Gemini result."""
+        return self._analysis(self.predict(user_story))
+
+    def analyse_batch(self, stories):
+        return {story: self._analysis(scores) for story, scores in zip(stories, self.predict_batch(list(stories)))}
+
+    def save(self, path):
+        import joblib
+        tmp_path = path + ".tmp"
+        joblib.dump({"idf": self.idf, "coef": self.coef, "intercept": self.intercept,
+                     "n_features": self.n_features, "report": self.report}, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        import joblib
+        return cls(**joblib.load(path))
+
+
+# --- Distillation data ---
+
+def _usable(analysis):
+    # Only genuine Gemini answers: no keyword fallbacks, skipped calls, reuses or local predictions
+    if not isinstance(analysis, dict):
+        return False
+    if analysis.get("fallback") or analysis.get("short_circuit") or analysis.get("local_model"):
+        return False
+    if "near_duplicate" in analysis:
+        return False
+    return all(isinstance(analysis.get(d), (int, float)) and not isinstance(analysis.get(d), bool)
+               for d in DIMENSIONS)
+
+
+def examples_from_cache(path):
+    """(story, analysis) pairs from a story-cache SQLite file (entries stored with their story)."""
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for (value,) in db.execute("SELECT value FROM story_cache"):
+            stored = json.loads(value)
+            if stored.get("story") and _usable(stored.get("analysis")):
+                yield stored["story"], stored["analysis"]
+    finally:
+        db.close()
+
+
+def examples_from_scored(path, chunk_size=50_000):
+    """(story, analysis) pairs from a `risk_engine score` output (CSV or JSONL)."""
+    from bulk_score import iter_chunks
+    for chunk in iter_chunks(path, chunk_size):
+        if "user_story" not in chunk.columns or "Text_Analysis" not in chunk.columns:
+            raise ValueError(f"{path} has no user_story/Text_Analysis columns")
+        for story, analysis in zip(chunk["user_story"], chunk["Text_Analysis"]):
+            if isinstance(analysis, str):
+                analysis = json.loads(analysis)
+            if isinstance(story, str) and story.strip() and _usable(analysis):
+                yield story, analysis
+
+
+def train(examples, holdout=0.2, alpha=1.0, seed=42):
+    """Fit on de-duplicated examples, holding out a share of stories for the agreement report."""
+    by_story = {}
+    for story, analysis in examples:
+        by_story[" ".join(story.split()).casefold()] = (story, [float(analysis[d]) for d in DIMENSIONS])
+    if len(by_story) < 10:
+        raise ValueError(f"need at least 10 distinct analysed stories, found {len(by_story)}")
+    stories = [story for story, _ in by_story.values()]
+    targets = np.array([scores for _, scores in by_story.values()])
+
+    order = np.random.default_rng(seed).permutation(len(stories))
+    n_test = max(1, int(len(stories) * holdout))
+    test, fit = order[:n_test], order[n_test:]
+
+    started = time.perf_counter()
+    model = LocalTextModel.fit([stories[i] for i in fit], targets[fit], alpha=alpha)
+    train_s = time.perf_counter() - started
+    held_out = model.predict_batch([stories[i] for i in test])
+    fast = np.array([model.predict(stories[i]) for i in test[:200]])
+
+    report = {
+        "stories": len(stories),
+        "train_stories": len(fit),
+        "holdout_stories": len(test),
+        "holdout": agreement(targets[test], held_out),
+        # The direct single-story path must give the same numbers as the batch path
+        "single_path_max_diff": float(np.abs(fast - held_out[:len(fast)]).max()),
+        "alpha": alpha,
+        "train_time_s": round(train_s, 2),
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    # Ship a model fitted on every story; the report describes its held-out behaviour
+    final = LocalTextModel.fit(stories, targets, alpha=alpha)
+    final.report = report
+    return final
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python text_model.py", description="Local text-risk model")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_cmd = commands.add_parser("train", help="distil stored Gemini analyses into a local model")
+    train_cmd.add_argument("--cache", action="append", default=[], help="story-cache SQLite file (repeatable)")
+    train_cmd.add_argument("--scored", action="append", default=[], help="risk_engine score output (repeatable)")
+    train_cmd.add_argument("--out", default="text_model.joblib")
+    train_cmd.add_argument("--holdout", type=float, default=0.2)
+    train_cmd.add_argument("--alpha", type=float, default=1.0, help="ridge regularisation")
+    args = parser.parse_args(argv)
+
+    sources = args.cache or ([] if args.scored else ["story_cache.sqlite"])
+    try:
+        examples = [pair for path in sources for pair in examples_from_cache(path)]
+        examples += [pair for path in args.scored for pair in examples_from_scored(path)]
+        model = train(examples, holdout=args.holdout, alpha=args.alpha)
+    except (OSError, sqlite3.Error, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    model.save(args.out)
+    overall = model.report["holdout"]["overall_risk"]
+    print(f"✅ Trained on {model.report['stories']:,} stories → {args.out}")
+    print(json.dumps(model.report["holdout"], indent=2))
+    print(f"Held-out overall_risk: MAE {overall['mae']}, within 10 points {overall['within_10']:.1%}, "
+          f"band agreement {model.report['holdout']['overall_band_agreement']:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())